@@ -1,73 +1,255 @@
-from prefect import flow, task, get_run_logger
+from prefect import flow, task, get_run_logger, unmapped
+from prefect.task_runners import ProcessPoolTaskRunner
 from prefect.tasks import task_input_hash
 from datetime import timedelta
+import glob
+import hashlib
+import os
+import time
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
+
+
+REQUIRED_COLUMNS = ['order_id', 'country', 'product', 'qty', 'price_usd', 'category']
+INTERMEDIATE_DIR = 'data/intermediate'
+CACHE_EXPIRATION = timedelta(days=7)
+
+
+# ---------------------
+# CACHING HELPERS
+# ---------------------
+
+def file_sha256(path: str, block_size: int = 1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_content_hash(context, parameters):
+    '''Cache key: content hash of the input file plus the task parameters.'''
+    return f"{file_sha256(parameters['path'])}-{task_input_hash(context, parameters)}"
+
+
+def intermediate_path(name: str):
+    '''Intermediates are Parquet files; tasks pass their paths, not DataFrames.'''
+    os.makedirs(INTERMEDIATE_DIR, exist_ok=True)
+    return os.path.join(INTERMEDIATE_DIR, f'{name}.parquet')
+
+
+def sales_output(path: str):
+    return intermediate_path(f'sales-{file_sha256(path)[:16]}')
+
+
+def revenue_output(path: str):
+    return path.replace('.parquet', '-revenue.parquet')
+
+
+def partials_output(path: str, chunk_size: int):
+    return intermediate_path(f'partials-{file_sha256(path)[:16]}-{chunk_size}')
+
+
+def while_output_exists(output_for, key_fn):
+    '''
+    Cache key for tasks that return the path of a file they write. While that
+    file is missing (e.g. data/intermediate was cleaned) the key is None: no
+    cache lookup, the task runs and writes it again, so a cache hit never
+    returns a path to a deleted file.
+    '''
+    def cache_key(context, parameters):
+        if not os.path.exists(output_for(**parameters)):
+            return None
+        return key_fn(context, parameters)
+    return cache_key
 
 
 # ---------------------
 # TASKS
 # ---------------------
 
-@task(retries=2, retry_delay_seconds=5)
+# Downstream tasks cache on their input path: it already embeds the content hash.
+# Tasks that return a path only use the cache while that file still exists.
+
+@task(retries=2, retry_delay_seconds=5,
+      cache_key_fn=while_output_exists(sales_output, file_content_hash),
+      cache_expiration=CACHE_EXPIRATION, persist_result=True)
 def extract_sales(path: str):
     logger = get_run_logger()
     logger.info('Extracting sales data...')
     df = pd.read_csv(path)
-    logger.info(f'Extracted {len(df)} rows')
-    return df
+    output = sales_output(path)
+    df.to_parquet(output, index=False)
+    logger.info(f'Extracted {len(df)} rows into {output}')
+    return output
 
 
-@task
-def validate_schema(df: pd.DataFrame):
+@task(cache_key_fn=while_output_exists(lambda path: path, task_input_hash),
+      cache_expiration=CACHE_EXPIRATION, persist_result=True)
+def validate_schema(path: str):
     logger = get_run_logger()
-    required = ['order_id', 'country', 'product', 'qty', 'price_usd', 'category']
-    missing = [c for c in required if c not in df.columns]
+    columns = pq.read_schema(path).names
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
 
     if missing:
         logger.error(f'Missing required columns: {missing}')
         raise ValueError('Invalid schema')
 
     logger.info('Schema validation passed.')
-    return df
+    return path
 
 
-@task
-def transform_add_revenue(df: pd.DataFrame):
+@task(cache_key_fn=while_output_exists(revenue_output, task_input_hash),
+      cache_expiration=CACHE_EXPIRATION, persist_result=True)
+def transform_add_revenue(path: str):
     logger = get_run_logger()
     logger.info('Calculating revenue column...')
+    df = pd.read_parquet(path)
     df['revenue'] = df['qty'] * df['price_usd']
-    logger.info('Revenue column added.')
-    return df
+    output = revenue_output(path)
+    df.to_parquet(output, index=False)
+    logger.info(f'Revenue column added: {output}')
+    return output
+
+
+@task(cache_key_fn=task_input_hash, cache_expiration=CACHE_EXPIRATION, persist_result=True)
+def transform_country_summaries(path: str):
+    logger = get_run_logger()
+    logger.info('Generating summaries for all countries in one grouped pass...')
+    df = pd.read_parquet(path, columns=['order_id', 'country', 'category', 'revenue'])
+
+    summary = df.groupby('country', sort=False).agg(
+        orders=('order_id', 'size'),
+        total_revenue=('revenue', 'sum'),
+    )
+
+    # Top category: most frequent (country, category) pair per country
+    counts = df.groupby(['country', 'category'], sort=False).size()
+    summary['top_category'] = counts.groupby(level='country', sort=False).idxmax().str[1]
+
+    summaries = summary.reset_index().to_dict('records')
+    logger.info(f'Generated {len(summaries)} country summaries.')
+    return summaries
 
 
 @task
-def branch_by_country(df: pd.DataFrame):
+def export_country_orders(d: pd.DataFrame, country: str, output_dir: str):
     logger = get_run_logger()
-    countries = df['country'].unique().tolist()
-    logger.info(f'Detected countries: {countries}')
-    return countries
+    output = os.path.join(output_dir, f'{country}.csv')
+    d.to_csv(output, index=False)
+    logger.info(f'Orders for {country} saved to {output}')
+    return output
+
+
+# ---------------------
+# STREAMING (MAP-REDUCE) TASKS
+# ---------------------
+
+def chunk_partial(chunk: pd.DataFrame):
+    '''Mergeable partial for one chunk: orders and revenue per (country, category).'''
+    chunk = chunk.assign(revenue=chunk['qty'] * chunk['price_usd'])
+    return chunk.groupby(['country', 'category'], sort=False).agg(
+        orders=('order_id', 'size'),
+        total_revenue=('revenue', 'sum'),
+    )
+
+
+def merge_partials(a: pd.DataFrame, b: pd.DataFrame):
+    return b if a is None else a.add(b, fill_value=0)
 
 
 @task
-def transform_country_summary(df: pd.DataFrame, country: str):
+def validate_header(path: str):
     logger = get_run_logger()
-    logger.info(f'Generating summary for country: {country}')
-    d = df[df['country'] == country]
-    summary = {
-        'country': country,
-        'orders': len(d),
-        'total_revenue': float(d['revenue'].sum()),
-        'top_category': d['category'].value_counts().idxmax()
-    }
-    logger.info(f'Summary for {country}: {summary}')
-    return summary
+    header = pd.read_csv(path, nrows=0).columns
+    missing = [c for c in REQUIRED_COLUMNS if c not in header]
+
+    if missing:
+        logger.error(f'Missing required columns: {missing}')
+        raise ValueError('Invalid schema')
+
+    logger.info('Schema validation passed (header only).')
+    return path
+
+
+@task(retries=2, retry_delay_seconds=5,
+      cache_key_fn=while_output_exists(partials_output, file_content_hash),
+      cache_expiration=CACHE_EXPIRATION, persist_result=True)
+def aggregate_chunks(path: str, chunk_size: int):
+    logger = get_run_logger()
+    logger.info(f'Aggregating {path} in chunks of {chunk_size:,} rows...')
+
+    usecols = ['order_id', 'country', 'qty', 'price_usd', 'category']
+    partial, n_rows = None, 0
+    for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunk_size):
+        partial = merge_partials(partial, chunk_partial(chunk))
+        n_rows += len(chunk)
+
+    if partial is None:
+        logger.warning('No rows to aggregate')
+        return None
+
+    output = partials_output(path, chunk_size)
+    partial.to_parquet(output)
+    logger.info(f'Aggregated {n_rows} rows into {len(partial)} partial groups: {output}')
+    return output
+
+
+@task(cache_key_fn=task_input_hash, cache_expiration=CACHE_EXPIRATION, persist_result=True)
+def reduce_partials(path: str):
+    logger = get_run_logger()
+    if path is None:
+        return []
+
+    partial = pd.read_parquet(path)
+
+    summary = partial.groupby(level='country', sort=False).sum()
+    summary['orders'] = summary['orders'].astype(int)
+
+    # Category counts are the per-category orders kept in the partial
+    summary['top_category'] = partial['orders'].groupby(level='country', sort=False).idxmax().str[1]
+
+    summaries = summary.reset_index().to_dict('records')
+    logger.info(f'Reduced partials into {len(summaries)} country summaries.')
+    return summaries
+
+
+# ---------------------
+# PARTITIONED TASKS
+# ---------------------
+
+@task
+def discover_partitions(input_dir: str, pattern: str):
+    logger = get_run_logger()
+    paths = sorted(glob.glob(os.path.join(input_dir, pattern)))
+    logger.info(f'Discovered {len(paths)} partitions in {input_dir}')
+    return paths
+
+
+@task
+def merge_partition_partials(paths: list):
+    logger = get_run_logger()
+    paths = [p for p in paths if p]
+    partial = None
+    for path in paths:
+        partial = merge_partials(partial, pd.read_parquet(path))
+
+    if partial is None:
+        logger.warning('No partials to merge')
+        return None
+
+    key = hashlib.sha256('|'.join(paths).encode()).hexdigest()[:16]
+    output = intermediate_path(f'partials-merged-{key}')
+    partial.to_parquet(output)
+    logger.info(f'Merged {len(paths)} partition partials into {output}')
+    return output
 
 
 @task
 def load_output(summaries: list, output: str):
     logger = get_run_logger()
     df = pd.DataFrame(summaries)
-    df = pd.DataFrame()
     if df.empty:
         logger.warning('No data to save')
     else:
@@ -81,20 +263,21 @@ def load_output(summaries: list, output: str):
 # ---------------------
 
 @flow(name='Sales Analytics ETL - Prefect Demo')
-def sales_etl():
+def sales_etl(export_per_country: bool = False):
     logger = get_run_logger()
     logger.info('Starting Sales ETL pipeline...')
 
-    df = extract_sales('data/sales_2024.csv')
-    df = validate_schema(df)
-    df = transform_add_revenue(df)
+    raw = extract_sales('data/sales_2024.csv')
+    raw = validate_schema(raw)
+    sales = transform_add_revenue(raw)
 
-    countries = branch_by_country(df)
+    summaries = transform_country_summaries(sales)
 
-    summaries = []
-    for c in countries:
-        summary = transform_country_summary(df, c)
-        summaries.append(summary)
+    # Fan-out only for country-specific outputs; each task gets its own slice
+    if export_per_country:
+        os.makedirs('data/countries', exist_ok=True)
+        for country, d in pd.read_parquet(sales).groupby('country', sort=False):
+            export_country_orders(d, country, 'data/countries')
 
     output = load_output(summaries, 'data/sales_summary.csv')
 
@@ -102,5 +285,107 @@ def sales_etl():
     return output
 
 
+@flow(name='Sales Analytics ETL - Streaming')
+def sales_etl_streaming(path: str = 'data/sales_2024.csv', chunk_size: int = 100_000):
+    logger = get_run_logger()
+    logger.info('Starting streaming Sales ETL pipeline...')
+
+    validate_header(path)
+    partials = aggregate_chunks(path, chunk_size)
+    summaries = reduce_partials(partials)
+
+    output = load_output(summaries, 'data/sales_summary.csv')
+
+    logger.info(f'ETL Finished. Output file: {output}')
+    return output
+
+
+@flow(name='Sales Analytics ETL - Partitioned', task_runner=ProcessPoolTaskRunner())
+def sales_etl_partitioned(input_dir: str = 'data/partitions', pattern: str = 'sales_*.csv',
+                          chunk_size: int = 100_000):
+    logger = get_run_logger()
+    logger.info('Starting partitioned Sales ETL pipeline...')
+
+    paths = discover_partitions(input_dir, pattern)
+
+    # One task per partition, run concurrently on the process pool
+    validated = validate_header.map(paths)
+    partials = aggregate_chunks.map(validated, chunk_size=unmapped(chunk_size))
+
+    merged = merge_partition_partials(partials)
+    summaries = reduce_partials(merged)
+
+    output = load_output(summaries, 'data/sales_summary.csv')
+
+    logger.info(f'ETL Finished. Output file: {output}')
+    return output
+
+
+def run_partitioned(workers: int = 4, **parameters):
+    '''Runs the partitioned flow with `workers` processes.'''
+    flow_with_workers = sales_etl_partitioned.with_options(task_runner=ProcessPoolTaskRunner(max_workers=workers))
+    return flow_with_workers(**parameters)
+
+
+def generate_partitions(input_dir: str = 'data/partitions', n_files: int = 16,
+                        rows_per_file: int = 500_000, seed: int = 0):
+    '''Synthetic daily/regional sales files for the scaling measurement.'''
+    os.makedirs(input_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    countries = [f'Country {i:03d}' for i in range(200)]
+    categories = ['Electronics', 'Home', 'Clothing', 'Sports', 'Books', 'Toys']
+
+    for i in range(n_files):
+        df = pd.DataFrame({
+            'order_id': np.arange(i * rows_per_file, (i + 1) * rows_per_file),
+            'country': rng.choice(countries, rows_per_file),
+            'product': rng.integers(1, 5_000, rows_per_file).astype(str),
+            'qty': rng.integers(1, 10, rows_per_file),
+            'price_usd': rng.uniform(1, 500, rows_per_file).round(2),
+            'category': rng.choice(categories, rows_per_file),
+        })
+        df.to_csv(os.path.join(input_dir, f'sales_2024_{i + 1:02d}.csv'), index=False)
+
+
+def measure_scaling(worker_counts=(1, 2, 4, 8), input_dir: str = 'data/partitions'):
+    '''Scaling curve of the partitioned flow (task cache refreshed on every run).'''
+    from prefect.settings import PREFECT_TASKS_REFRESH_CACHE, temporary_settings
+
+    if not glob.glob(os.path.join(input_dir, 'sales_*.csv')):
+        generate_partitions(input_dir)
+
+    timings = {}
+    with temporary_settings({PREFECT_TASKS_REFRESH_CACHE: True}):
+        for workers in worker_counts:
+            start = time.perf_counter()
+            run_partitioned(workers, input_dir=input_dir)
+            timings[workers] = time.perf_counter() - start
+
+    base = timings[worker_counts[0]]
+    print(f"{'workers':>8} {'seconds':>10} {'speedup':>9}")
+    for workers, elapsed in timings.items():
+        print(f'{workers:>8} {elapsed:>10.2f} {base / elapsed:>8.2f}x')
+    return timings
+
+
+def measure_cold_vs_warm():
+    '''Runs sales_etl with the task cache refreshed (cold) and then reusing it (warm).'''
+    from prefect.settings import PREFECT_TASKS_REFRESH_CACHE, temporary_settings
+
+    timings = {}
+    with temporary_settings({PREFECT_TASKS_REFRESH_CACHE: True}):
+        start = time.perf_counter()
+        sales_etl()
+        timings['cold'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sales_etl()
+    timings['warm'] = time.perf_counter() - start
+
+    print(f"Cold run: {timings['cold']:.2f}s | Warm run: {timings['warm']:.2f}s "
+          f"({timings['cold'] / timings['warm']:.1f}x faster)")
+    return timings
+
+
 if __name__ == '__main__':
     sales_etl()
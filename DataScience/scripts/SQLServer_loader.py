@@ -1,24 +1,48 @@
 import os
-import pandas as pd
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pyodbc
 from tqdm import tqdm
 
+from csv_schema import SchemaCache
+from load_manifest import LoadManifest
+from loader_engine import LoaderEngine, SQLServerBackend
+
 class SQLServerLoader:
     '''
-    SQLServerLoader automatically:
+    SQLServerLoader automatically (on top of loader_engine.LoaderEngine):
     - Reads one CSV file or all CSVs inside a folder.
     - Uses the CSV filename as the SQL Server table name.
-    - Detects SQL types based on pandas dtypes.
+    - Infers SQL types from a bounded sample of each CSV and caches the
+      schema per table (schema_dir), so later loads skip inference.
     - Auto-creates the SQL Server table.
+    - Optionally streams each CSV in bounded chunks (streaming=True), so
+      memory stays flat regardless of the file size. A chunk that needs a
+      wider type than the sample widens the column before it is inserted,
+      and datetime values that do not parse are counted in stats.
+    - Optionally loads several files at once (workers > 1), each worker
+      using its own pooled connection; a failing file does not stop the rest.
+    - Commits each chunk in its own transaction together with its checkpoint
+      in the database's load_manifest table (resumable=True): reruns skip
+      finished files and resume partial ones at the last committed chunk.
     '''
 
-    def __init__(self, server: str, database: str, source_path: str):
+    def __init__(self, server: str, database: str, source_path: str,
+                 streaming: bool = False, chunk_size: int = 50_000, workers: int = 1,
+                 schema_dir: str = 'schemas', resumable: bool = True):
         self.server = server
         self.database = database
         self.source_path = source_path
+        self.streaming = streaming
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.stats = {}
+        self.errors = {}
+        self.schema_cache = SchemaCache(schema_dir)
+        self.resumable = resumable
 
-        self.conn = self.connect_sql_server()
-        self.cursor = self.conn.cursor()
+        # Parallel loads use one pooled connection per worker instead
+        self.conn = self.connect_sql_server() if workers <= 1 else None
 
         self.files = self.collect_csv_files()
         self.process_files()
@@ -50,113 +74,82 @@ class SQLServerLoader:
 
     # 3. Process files
     def process_files(self):
+        if self.workers > 1:
+            self.process_files_parallel()
+            return
+
+        self.create_state_table(self.conn)
         for file_path in self.files:
             print(f'\n➡ Processing file: {file_path}')
-
-            table_name = os.path.splitext(os.path.basename(file_path))[0]
-            print(f'   → Using table name: {table_name}')
-
-            df = self.load_dataframe(file_path)
-            self.create_table(table_name, df)
-            self.insert_data(table_name, df)
-
-    # 4. Load CSV
-    def load_dataframe(self, file_path):
-        df = pd.read_csv(file_path)
-
-        for col in df.select_dtypes(include=['object']).columns:
+            self.load_file(file_path, self.conn)
+
+    def create_state_table(self, conn):
+        '''Load state table, created once before any file loads (not by each worker).'''
+        if self.resumable:
+            SQLServerBackend(conn).create_state_table()
+
+    def load_file(self, file_path, conn, position=0):
+        table_name = os.path.splitext(os.path.basename(file_path))[0]
+        print(f'   → Using table name: {table_name}')
+
+        backend = SQLServerBackend(conn)
+        engine = LoaderEngine(backend,
+                              chunk_size=self.chunk_size if self.streaming else 5000,
+                              schema_cache=self.schema_cache,
+                              manifest=LoadManifest(backend, create_table=False) if self.resumable else None)
+        stats = engine.load_csv(file_path, table_name, streaming=self.streaming, position=position)
+        if stats:
+            self.stats[table_name] = stats
+
+    # 3b. Parallel processing (one pooled connection per worker)
+    def process_files_parallel(self):
+        print(f'Opening {self.workers} pooled connections...')
+        pool = queue.Queue()
+        for slot in range(self.workers):
+            pool.put((slot, self.connect_sql_server()))
+
+        # Concurrent IF NOT EXISTS + CREATE on several connections can race
+        slot, conn = pool.get()
+        self.create_state_table(conn)
+        pool.put((slot, conn))
+
+        def work(file_path):
+            slot, conn = pool.get()
             try:
-                df[col] = pd.to_datetime(df[col], format='mixed').dt.tz_localize(None)
-            except Exception:
-                pass
-
-        return df
-
-    # 5. Map pandas dtype → SQL type
-    def map_dtype_to_sql(self, dtype):
-        dtype = str(dtype)
-
-        if 'int' in dtype:
-            return 'INT'
-        if 'float' in dtype:
-            return 'FLOAT'
-        if 'datetime' in dtype:
-            return 'DATETIME'
-        if 'bool' in dtype:
-            return 'BIT'
-
-        return 'VARCHAR(255)'
-
-    # 6. Create SQL table
-    def create_table(self, table_name, df):
-        print(f"   → Creating table '{table_name}'...")
-
-        col_defs = []
-
-        for col, dtype in df.dtypes.items():
-            sql_type = self.map_dtype_to_sql(dtype)
-            col_defs.append(f'[{col}] {sql_type}')
-
-        create_sql = f'''
-        IF NOT EXISTS (
-            SELECT * FROM sysobjects
-            WHERE name = '{table_name}' AND xtype = 'U'
-        )
-        CREATE TABLE [{table_name}] (
-            {', '.join(col_defs)}
-        );
-        '''
-
-        self.cursor.execute(create_sql)
-        print(f"   ✔ Table '{table_name}' created or already exists.")
-
-    # 7. Insert data
-    def insert_data(self, table_name, df, chunk_size=5000):
-        print(f"   → Inserting data into '{table_name}'...")
-
-        # Enable optimized batch insertion
-        self.cursor.fast_executemany = True
-
-        # Convert datetime columns
-        for col in df.columns:
-            if 'datetime' in str(df[col].dtype):
-                df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S')
-
-        # Replace NaN with None
-        df = df.where(pd.notnull(df), None)
-
-        # Prepare SQL INSERT
-        columns = df.columns.tolist()
-        sql_cols = ', '.join(f'[{c}]' for c in columns)
-        placeholders = ', '.join(['?'] * len(columns))
-
-        insert_sql = f"""
-        INSERT INTO [{table_name}] ({sql_cols})
-        VALUES ({placeholders})
-        """
+                self.load_file(file_path, conn, position=slot + 1)
+            finally:
+                pool.put((slot, conn))
 
-        records = df.values.tolist()
-        total_rows = len(records)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(work, f): f for f in self.files}
 
-        print(f"   → Total rows to insert: {total_rows:,}")
+            for future in tqdm(as_completed(futures), total=len(futures), desc='Tables', position=0):
+                table_name = os.path.splitext(os.path.basename(futures[future]))[0]
+                try:
+                    future.result()
+                except Exception as exc:
+                    # Error isolation: record the failure and keep loading the rest
+                    self.errors[table_name] = str(exc)
+                    print(f"   ✖ Failed '{table_name}': {exc}")
 
-        # Insert using chunks with progress bar
-        for i in tqdm(range(0, total_rows, chunk_size), desc="   → Progress"):
-            chunk = records[i:i+chunk_size]
-            self.cursor.executemany(insert_sql, chunk)
+        while not pool.empty():
+            pool.get()[1].close()
 
-        print(f"   ✔ Inserted {total_rows:,} rows successfully.")
+        print(f'\n✔ Loaded {len(self.files) - len(self.errors)}/{len(self.files)} files.')
 
-    # 8. Close
+    # 4. Close
     def close(self):
-        self.conn.close()
-        print('\nConnection closed.')
+        if self.conn:
+            self.conn.close()
+            print('\nConnection closed.')
 
 
 if __name__ == '__main__':
     loader = SQLServerLoader(
         server='DESKTOP-21KF01T',
         database='LogisticsOps2022_2024',
-        source_path=r'D:\DevPold\Kaggle\logistics-operations-database'
+        source_path=r'D:\DevPold\Kaggle\logistics-operations-database',
+        streaming=True,
+        workers=4
     )
     loader.close()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+from SQLServer_loader import SQLServerLoader
+from csv_schema import SchemaCache
+
+
+class StandInCursor:
+    '''
+    Local stand-in for a pyodbc cursor. Each call sleeps as a real server
+    round trip would (fixed latency + per-row cost), which releases the GIL
+    exactly like pyodbc does while it waits on the network.
+    '''
+
+    def __init__(self, round_trip: float, per_row: float):
+        self.round_trip = round_trip
+        self.per_row = per_row
+        self.fast_executemany = False
+        self.rows = 0
+
+    def execute(self, sql):
+        time.sleep(self.round_trip)
+
+    def executemany(self, sql, records):
+        time.sleep(self.round_trip + self.per_row * len(records))
+        self.rows += len(records)
+
+
+class StandInConnection:
+    def __init__(self, round_trip: float, per_row: float):
+        self.round_trip = round_trip
+        self.per_row = per_row
+
+    def cursor(self):
+        return StandInCursor(self.round_trip, self.per_row)
+
+    def close(self):
+        pass
+
+
+class StandInLoader(SQLServerLoader):
+    '''SQLServerLoader wired to the stand-in connection instead of pyodbc.'''
+
+    round_trip = 0.005
+    per_row = 2e-6
+
+    def connect_sql_server(self):
+        return StandInConnection(self.round_trip, self.per_row)
+
+
+def generate_csvs(folder: str, n_files: int, n_rows: int):
+    rng = np.random.default_rng(0)
+    for i in range(n_files):
+        df = pd.DataFrame({
+            'id': np.arange(n_rows),
+            'amount': rng.normal(100, 25, n_rows).round(2),
+            'category': rng.choice(['A', 'B', 'C', 'D'], n_rows),
+            'created_at': pd.date_range('2024-01-01', periods=n_rows, freq='min').astype(str),
+        })
+        df.to_csv(os.path.join(folder, f'table_{i:02d}.csv'), index=False)
+
+
+def main(n_files: int = 30, n_rows: int = 20_000, worker_counts=(1, 2, 4, 8)):
+    with tempfile.TemporaryDirectory() as folder:
+        print(f'Generating {n_files} CSVs x {n_rows:,} rows in {folder}...')
+        generate_csvs(folder, n_files, n_rows)
+
+        # Warm the schema cache so every run measures loading only
+        schema_cache = SchemaCache(os.path.join(folder, 'schemas'))
+        for i in range(n_files):
+            schema_cache.get(f'table_{i:02d}', os.path.join(folder, f'table_{i:02d}.csv'))
+
+        results = []
+        for workers in worker_counts:
+            start = time.perf_counter()
+            # No load state: the stand-in has no tables, and every run loads every file
+            loader = StandInLoader(server='stand-in', database='bench', source_path=folder,
+                                   streaming=True, chunk_size=5_000, workers=workers,
+                                   schema_dir=os.path.join(folder, 'schemas'), resumable=False)
+            elapsed = time.perf_counter() - start
+            results.append((workers, elapsed, len(loader.errors)))
+
+    base = results[0][1]
+    print(f"\n{'workers':>8} {'seconds':>10} {'speedup':>9} {'errors':>7}")
+    for workers, elapsed, errors in results:
+        print(f'{workers:>8} {elapsed:>10.2f} {base / elapsed:>8.2f}x {errors:>7}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+import json
+import os
+import pandas as pd
+
+# SQL Server INT upper bound, and how far past the sampled range an int
+# column must fit before it gets INT instead of BIGINT
+INT_MAX = 2_147_483_647
+INT_HEADROOM = 100
+
+# Every column is read as text and converted by fit_chunk (datetimes by
+# parse_datetimes): a value the sampled type can't hold then widens the
+# column instead of making the reader fail after earlier chunks were committed
+READER_DTYPE = 'object'
+
+# Text values accepted by bool columns (compared lowercased)
+BOOL_VALUES = {'true': True, 'false': False, '1': True, '0': False, '1.0': True, '0.0': False}
+
+
+class SchemaCache:
+    '''
+    SchemaCache:
+    - Infers column types from the first `sample_rows` rows of a CSV
+      (datetime, int range, float, bool, text length).
+    - Saves the result as JSON, one file per table, inside `folder`.
+    - Reuses the cached schema on later loads while the CSV header matches,
+      so inference runs only once per table. Edit the JSON to widen a type.
+    - The sample can be too narrow for the rest of the file (a wider int, a
+      decimal, a longer text, a word in a bool/number column): fit_chunk()
+      widens the schema while loading and save() stores the wider version.
+    '''
+
+    def __init__(self, folder: str = 'schemas', sample_rows: int = 10_000):
+        self.folder = folder
+        self.sample_rows = sample_rows
+
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    def path_for(self, table_name):
+        return os.path.join(self.folder, f'{table_name}.json')
+
+    def get(self, table_name, file_path):
+        '''Returns the cached schema for the table, inferring it if needed.'''
+        header = pd.read_csv(file_path, nrows=0).columns.tolist()
+        path = self.path_for(table_name)
+
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                schema = json.load(f)
+            if list(schema) == header:
+                return schema
+            print(f"   → Header changed for '{table_name}', inferring schema again.")
+
+        schema = self.infer(file_path)
+        self.save(table_name, schema)
+
+        return schema
+
+    def save(self, table_name, schema):
+        with open(self.path_for(table_name), 'w', encoding='utf-8') as f:
+            json.dump(schema, f, indent=2)
+
+    def infer(self, file_path):
+        '''Decides each column's type from a bounded sample of the file.'''
+        sample = pd.read_csv(file_path, nrows=self.sample_rows)
+        return {col: infer_column(sample[col]) for col in sample.columns}
+
+
+def infer_column(s: pd.Series):
+    values = s.dropna()
+
+    if values.empty:
+        return {'kind': 'text', 'length': 255}
+
+    if pd.api.types.is_bool_dtype(s):
+        return {'kind': 'bool'}
+
+    if pd.api.types.is_integer_dtype(s) or (
+            pd.api.types.is_float_dtype(s) and (values % 1 == 0).all()):
+        # Float columns holding only whole numbers are ints with missing values
+        return {'kind': 'int', 'min': int(values.min()), 'max': int(values.max())}
+
+    if pd.api.types.is_float_dtype(s):
+        return {'kind': 'float'}
+
+    try:
+        pd.to_datetime(values, format='mixed')
+        return {'kind': 'datetime'}
+    except Exception:
+        pass
+
+    return {'kind': 'text', 'length': int(values.astype(str).str.len().max())}
+
+
+def reader_kwargs(schema):
+    '''Explicit dtypes for pd.read_csv, so the reader does no guessing.'''
+    return {'dtype': {col: READER_DTYPE for col in schema}}
+
+
+def text_spec(s: pd.Series):
+    return {'kind': 'text', 'length': int(s.dropna().astype(str).str.len().max())}
+
+
+def fit_column(s: pd.Series, spec):
+    '''
+    Converts one column (as read) to its kind. Returns (values, spec), with a
+    wider spec when the sample was too narrow for it:
+    - int: decimals make it float, the range grows to cover the chunk.
+    - int / float / bool: a value that isn't one makes it text.
+    - text: a value longer than the declared length grows the length.
+    '''
+    kind = spec['kind']
+    present = s.notna()
+    if not present.any() or kind == 'datetime':
+        return s, spec
+
+    if kind in ('int', 'float'):
+        # Nullable dtypes keep ints beyond 2**53 exact
+        numbers = pd.to_numeric(s, errors='coerce', dtype_backend='numpy_nullable')
+        if (numbers.isna() & present).any():
+            return s, text_spec(s)
+        if kind == 'float':
+            return numbers.astype('float64'), spec
+
+        values = numbers.dropna()
+        if not (values % 1 == 0).all():
+            return numbers.astype('float64'), {'kind': 'float'}
+        low, high = int(values.min()), int(values.max())
+        if low < spec['min'] or high > spec['max']:
+            spec = dict(spec, min=min(spec['min'], low), max=max(spec['max'], high))
+        return numbers.astype('Int64'), spec
+
+    if kind == 'bool':
+        flags = s.astype(str).str.strip().str.lower().map(BOOL_VALUES)
+        if (flags.isna() & present).any():
+            return s, text_spec(s)
+        return flags.where(present).astype('boolean'), spec
+
+    longest = text_spec(s)['length']
+    capacity = text_length(spec)
+    if capacity is not None and longest > capacity:
+        spec = dict(spec, length=longest)
+    return s, spec
+
+
+def fit_chunk(df, schema):
+    '''
+    Makes a chunk match the schema (see fit_column), widening the schema in
+    place where the sample was too narrow. Returns (df, columns whose SQL
+    type changed), so the caller can widen the table before inserting.
+    '''
+    widened = []
+    for col, spec in list(schema.items()):
+        if col not in df.columns:
+            continue
+
+        df[col], new_spec = fit_column(df[col], spec)
+        if new_spec != spec:
+            schema[col] = new_spec
+            if sql_server_type(new_spec) != sql_server_type(spec):
+                widened.append(col)
+
+    return df, widened
+
+
+def parse_datetimes(df, schema, coerced=None):
+    '''
+    Converts only the columns the schema marks as datetimes. Values that do
+    not parse become NaT; pass a dict as `coerced` to count them per column.
+    '''
+    for col, spec in schema.items():
+        if spec['kind'] == 'datetime' and col in df.columns:
+            parsed = pd.to_datetime(df[col], format='mixed', errors='coerce').dt.tz_localize(None)
+
+            if coerced is not None:
+                lost = int((parsed.isna() & df[col].notna()).sum())
+                if lost:
+                    coerced[col] = coerced.get(col, 0) + lost
+
+            df[col] = parsed
+
+    return df
+
+
+def sql_server_type(spec):
+    kind = spec['kind']
+
+    if kind == 'int':
+        # Headroom over the sampled range: at least INT, BIGINT unless the
+        # column fits INT with INT_HEADROOM times its sampled magnitude
+        magnitude = max(abs(spec['min']), abs(spec['max']))
+        return 'INT' if magnitude * INT_HEADROOM <= INT_MAX else 'BIGINT'
+    if kind == 'float':
+        return 'FLOAT'
+    if kind == 'datetime':
+        return 'DATETIME'
+    if kind == 'bool':
+        return 'BIT'
+
+    length = text_length(spec)
+    return f'VARCHAR({length})' if length is not None else 'VARCHAR(MAX)'
+
+
+def text_length(spec):
+    '''VARCHAR length of a text column, with headroom over the sampled length (None for MAX).'''
+    length = max(50, int(spec.get('length', 255) * 1.5))
+    return length if length <= 8000 else None
+
+
+def sqlite_type(spec):
+    kind = spec['kind']
+
+    if kind in ('int', 'bool'):
+        return 'INTEGER'
+    if kind == 'float':
+        return 'REAL'
+
+    return 'TEXT'
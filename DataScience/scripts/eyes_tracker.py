@@ -3,15 +3,21 @@ from tkinter import messagebox
 from PIL import Image, ImageTk
 import cv2
 import mediapipe as mp
-import math
 import numpy as np
 import platform
+import time
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 import imutils
 
 import customtkinter as ctk
 
+import landmarks as lmk
+from frame_pipeline import FramePipeline
+from instrumentation import NULL_TIMER, FrameProfiler
+from landmark_recorder import SeriesRecorder
+
 ctk.set_appearance_mode('dark')
 ctk.set_default_color_theme('dark-blue')
 
@@ -26,10 +32,215 @@ RIGHT_EYE_TOP = 159
 RIGHT_EYE_BOTTOM = 145
 LEFT_EYE_TOP = 386
 LEFT_EYE_BOTTOM = 374
+EYE_TOPS = [RIGHT_EYE_TOP, LEFT_EYE_TOP]
+EYE_BOTTOMS = [RIGHT_EYE_BOTTOM, LEFT_EYE_BOTTOM]
+FACE_POINTS = 478  # FaceMesh con refine_landmarks=True (468 + iris)
+
+
+class EyeOpeningPlot:
+    '''
+    EyeOpeningPlot: gráfico de apertura de ojos.
+    - fast=True: ring buffer numpy preasignado (append O(1), ventana contigua
+      sin copias), blitting que redibuja solo las dos líneas sobre un fondo
+      cacheado, y refresco limitado a `refresh_fps`, independiente del video.
+    - fast=False: listas con pop(0) y canvas.draw() completo en cada frame
+      (comportamiento original, se mantiene para comparar).
+    '''
+
+    def __init__(self, fig, canvas, max_points: int = 200, fast: bool = True, refresh_fps: float = 15):
+        self.fig = fig
+        self.canvas = canvas
+        self.max_points = max_points
+        self.fast = fast
+        self.refresh_interval = 1 / refresh_fps
+        self.last_refresh = 0.0
+
+        self.ax = fig.add_subplot(111)
+        self.ax.set_title('Apertura de ojos')
+        self.ax.set_xlabel('Frames')
+        self.ax.set_ylabel('Distancia (px)')
+        self.ax.set_xlim(0, max_points)
+        self.ax.set_ylim(0, 50)
+        self.line_left, = self.ax.plot([], [], label='Ojo Izquierdo', color='green', animated=fast)
+        self.line_right, = self.ax.plot([], [], label='Ojo Derecho', color='blue', animated=fast)
+        self.ax.legend()
+
+        if fast:
+            # Cada muestra se escribe en i y en i + max_points: la ventana de los
+            # últimos max_points valores siempre es el slice contiguo [i + 1, i + 1 + max_points)
+            self.buffer = np.full((2, 2 * max_points), np.nan, dtype=np.float32)
+            self.index = 0
+            self.x = np.arange(max_points)
+
+            self.fig.tight_layout()
+            self.background = None
+            self.canvas.mpl_connect('draw_event', self.on_draw)
+            self.canvas.draw()
+        else:
+            self.left_data = []
+            self.right_data = []
+
+    def on_draw(self, event=None):
+        # Fondo (ejes, títulos, leyenda) cacheado tras cada redibujo completo (p. ej. al redimensionar)
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_lines()
+
+    def add(self, left_len: float, right_len: float):
+        if self.fast:
+            i = self.index
+            self.buffer[:, i] = self.buffer[:, i + self.max_points] = (left_len, right_len)
+            self.index = (i + 1) % self.max_points
+        else:
+            self.left_data.append(left_len)
+            self.right_data.append(right_len)
+            if len(self.left_data) > self.max_points:
+                self.left_data.pop(0)
+                self.right_data.pop(0)
+
+    def window(self):
+        '''Últimos max_points valores (izquierdo, derecho), del más viejo al más nuevo, sin copiar.'''
+        return self.buffer[:, self.index:self.index + self.max_points]
+
+    def draw_lines(self):
+        left, right = self.window()
+        self.line_left.set_data(self.x, left)
+        self.line_right.set_data(self.x, right)
+        self.ax.draw_artist(self.line_left)
+        self.ax.draw_artist(self.line_right)
+
+    def refresh(self, force: bool = False):
+        if not self.fast:
+            self.line_left.set_data(range(len(self.left_data)), self.left_data)
+            self.line_right.set_data(range(len(self.right_data)), self.right_data)
+            self.ax.set_xlim(0, self.max_points)    # Eje X dinámico
+            self.ax.set_ylim(0, 50)                 # Eje Y fijo
+            self.fig.tight_layout()
+            self.canvas.draw()
+            return
+
+        now = time.perf_counter()
+        if not force and now - self.last_refresh < self.refresh_interval:
+            return
+        self.last_refresh = now
+
+        if self.background is None:
+            self.canvas.draw()
+            return
+
+        self.canvas.restore_region(self.background)
+        self.draw_lines()
+        self.canvas.blit(self.ax.bbox)
+
+
+def benchmark_plot(n_frames: int = 300, max_points: int = 200):
+    '''
+    Tiempo por frame de add + refresh: gráfico original vs. ring buffer + blitting.
+    - refresh(force=True): sin el límite de refresh_interval, que en un loop
+      sin pausas saltaría casi todas las llamadas y mediría solo add().
+    - En Agg canvas.blit no copia a pantalla: se mide restaurar el fondo y
+      redibujar las líneas, que es el costo propio del gráfico.
+    '''
+    rng = np.random.default_rng(0)
+    samples = rng.uniform(5, 40, (n_frames, 2))
+
+    results = {}
+    for name, fast in [('original (draw completo)', False), ('ring buffer + blit', True)]:
+        fig = Figure(figsize=(8, 4), dpi=100)
+        plot = EyeOpeningPlot(fig, FigureCanvasAgg(fig), max_points, fast=fast)
+        times = []
+        for left, right in samples:
+            start = time.perf_counter()
+            plot.add(left, right)
+            plot.refresh(force=True)
+            times.append(time.perf_counter() - start)
+        times = np.array(times) * 1000
+        results[name] = times
+        print(f'{name:<26} media {times.mean():7.2f} ms   p95 {np.percentile(times, 95):7.2f} ms')
+
+    return results
+
+
+class EyeProcessor:
+    '''
+    EyeProcessor: procesamiento por frame sin Tk, compartido por EyeTrackerApp
+    y tracker_replay: resize, FaceMesh, apertura de ambos ojos y dibujo de los
+    puntos. Cada etapa se mide con `timer` (ver instrumentation).
+    '''
+
+    def __init__(self, timer=NULL_TIMER):
+        self.face_mesh = mp_face_mesh.FaceMesh(max_num_faces=1, refine_landmarks=True)
+        self.timer = timer
+
+    def resize(self, frame):
+        with self.timer.stage('resize'):
+            return imutils.resize(frame, width=960)
+
+    @staticmethod
+    def get_eye_distance(pixels, distance, idx1, idx2):
+        return float(distance), lmk.point(pixels, idx1), lmk.point(pixels, idx2)
+
+    def measure(self, frame) -> dict:
+        '''{'right': (distancia, p1, p2) o None, 'left': ..., 'face': landmarks (N, 3) normalizados o None}'''
+        with self.timer.stage('color'):
+            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        with self.timer.stage('inferencia'):
+            results = self.face_mesh.process(frame_rgb)
+
+        with self.timer.stage('medicion'):
+            h, w, _ = frame.shape
+            face = lmk.face_array(results)
+            measures = {'right': None, 'left': None, 'face': face}
+            if face is not None:
+                # Ambos ojos en una sola operación vectorizada
+                pixels = lmk.to_pixels(face, w, h)
+                right, left = lmk.distances(pixels, EYE_TOPS, EYE_BOTTOMS)
+                measures['right'] = self.get_eye_distance(pixels, right, RIGHT_EYE_TOP, RIGHT_EYE_BOTTOM)
+                measures['left'] = self.get_eye_distance(pixels, left, LEFT_EYE_TOP, LEFT_EYE_BOTTOM)
+
+        return measures
+
+    def draw(self, frame, measures):
+        with self.timer.stage('dibujo'):
+            if measures['right'] and measures['left']:
+                # Ojo derecho
+                _, p1, p2 = measures['right']
+                cv2.circle(frame, p1, 2, (255, 0, 0), -1)
+                cv2.circle(frame, p2, 2, (255, 0, 0), -1)
+
+                # Ojo izquierdo
+                _, p3, p4 = measures['left']
+                cv2.circle(frame, p3, 2, (0, 255, 0), -1)
+                cv2.circle(frame, p4, 2, (0, 255, 0), -1)
+        return frame
+
+    def step(self, frame) -> dict:
+        '''Un frame completo sin Tk; devuelve las señales (distancias de cada ojo).'''
+        frame = self.resize(frame)
+        measures = self.measure(frame)
+        self.draw(frame, measures)
+        return {
+            'right': measures['right'][0] if measures['right'] else None,
+            'left': measures['left'][0] if measures['left'] else None,
+        }
 
 
 class EyeTrackerApp:
-    def __init__(self, root):
+    '''
+    EyeTrackerApp:
+    - Modo serial (pipeline=False): captura, inferencia y dibujo en el loop de Tk.
+    - Modo pipeline (pipeline=True): captura e inferencia de FaceMesh en hilos
+      conectados por colas donde gana el frame más reciente; el loop de Tk solo
+      dibuja el último resultado y muestra FPS por etapa y latencia.
+    - fast_plot / plot_fps: ver EyeOpeningPlot.
+    - Tiempos por etapa con FrameProfiler: hud=True los dibuja sobre el video y
+      profile_path exporta CSV / JSON al cerrar la ventana.
+    - record_path: graba cada frame con SeriesRecorder (ver landmark_recorder):
+      'face' = landmarks normalizados (478, 3) y 'aperture' = (derecho, izquierdo)
+      en píxeles; NaN sin rostro. El gráfico sigue mostrando solo max_points.
+    '''
+
+    def __init__(self, root, pipeline: bool = False, fast_plot: bool = True, plot_fps: float = 15,
+                 hud: bool = False, profile_path: str = None, record_path: str = None):
         self.root = root
         self.root.title('Eye Opening Tracker')
 
@@ -37,19 +248,21 @@ class EyeTrackerApp:
         self.video_label = tk.Label(root)
         self.video_label.grid(row=0, column=0)
 
+        # Tiempo por frame, FPS por etapa y latencia (modo pipeline)
+        self.stats_label = tk.Label(root, text='', anchor='w')
+        self.stats_label.grid(row=2, column=0, sticky='we', padx=10)
+
         # Matplotlib Figure
         self.fig = Figure(figsize=(8, 4), dpi=100)
-        self.ax = self.fig.add_subplot(111)
-        self.ax.set_title('Apertura de ojos')
-        self.ax.set_xlabel('Frames')
-        self.ax.set_ylabel('Distancia (px)')
-        self.ax.set_ylim(0, 50)
-        self.line_left, = self.ax.plot([], [], label='Ojo Izquierdo', color='green')
-        self.line_right, = self.ax.plot([], [], label='Ojo Derecho', color='blue')
-        self.ax.legend()
-
         self.canvas = FigureCanvasTkAgg(self.fig, master=root)
         self.canvas.get_tk_widget().grid(row=1, column=0, padx=10, pady=10)
+        self.max_points = 200  # número máximo de puntos en el gráfico
+        self.plot = EyeOpeningPlot(self.fig, self.canvas, self.max_points, fast=fast_plot, refresh_fps=plot_fps)
+
+        # Instrumentación
+        self.profiler = FrameProfiler()
+        self.hud = hud
+        self.profile_path = profile_path
 
         # Variables
         system_name = platform.system()
@@ -71,81 +284,120 @@ class EyeTrackerApp:
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
         self.cap.set(cv2.CAP_PROP_FPS, 30)
-        self.left_data = []
-        self.right_data = []
-        self.max_points = 200  # número máximo de puntos en el gráfico
 
         # MediaPipe FaceMesh
-        self.face_mesh = mp_face_mesh.FaceMesh(max_num_faces=1, refine_landmarks=True)
+        self.processor = EyeProcessor(timer=self.profiler)
 
-        # Loop principal
-        self.update_video()
+        # Grabación de la serie completa
+        self.recorder = None
+        if record_path:
+            self.recorder = SeriesRecorder(record_path, {'face': (FACE_POINTS, 3), 'aperture': (2,)})
 
-    def get_eye_distance(self, landmarks, idx1, idx2, w, h):
-        x1, y1 = int(landmarks[idx1].x * w), int(landmarks[idx1].y * h)
-        x2, y2 = int(landmarks[idx2].x * w), int(landmarks[idx2].y * h)
-        return math.hypot(x2 - x1, y2 - y1), (x1, y1), (x2, y2)
+        # Loop principal
+        self.root.protocol('WM_DELETE_WINDOW', self.close)
+        self.pipeline = None
+        if pipeline:
+            self.pipeline = FramePipeline(self.capture_frame, self.infer)
+            self.pipeline.start()
+            self.update_pipeline()
+        else:
+            self.update_video()
 
-    def update_video(self):
-        ret, frame = self.cap.read()
+    def capture_frame(self):
+        '''Etapa de captura: lee y redimensiona un frame (None si la cámara no entregó nada).'''
+        with self.profiler.stage('captura'):
+            ret, frame = self.cap.read()
         if not ret:
-            self.root.after(10, self.update_video)
-            return
-        
-        frame = imutils.resize(frame, width=960)
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(frame_rgb)
-
-        h, w, _ = frame.shape
-        left_len, right_len = None, None
-
-        if results.multi_face_landmarks:
-            face_landmarks = results.multi_face_landmarks[0].landmark
-
-            # Ojo derecho
-            right_len, p1, p2 = self.get_eye_distance(face_landmarks,
-                                                      RIGHT_EYE_TOP,
-                                                      RIGHT_EYE_BOTTOM,
-                                                      w, h)
-            cv2.circle(frame, p1, 2, (255, 0, 0), -1)
-            cv2.circle(frame, p2, 2, (255, 0, 0), -1)
-
-            # Ojo izquierdo
-            left_len, p3, p4 = self.get_eye_distance(face_landmarks,
-                                                     LEFT_EYE_TOP,
-                                                     LEFT_EYE_BOTTOM,
-                                                     w, h)
-            cv2.circle(frame, p3, 2, (0, 255, 0), -1)
-            cv2.circle(frame, p4, 2, (0, 255, 0), -1)
+            time.sleep(0.005)
+            return None
+        frame = self.processor.resize(frame)
+        # Tiempos de este frame en el hilo de captura; viajan con el paquete hasta tick()
+        return {'t_capture': time.perf_counter(), 'time': time.time(), 'frame': frame,
+                'stages': self.profiler.take()}
+
+    def infer(self, packet):
+        '''
+        Etapa de inferencia: FaceMesh + distancias de los ojos sobre el paquete.
+        Graba acá y no en render(): en modo pipeline el loop de Tk solo dibuja
+        el último resultado y la serie perdería los frames que salta.
+        '''
+        packet.update(self.processor.measure(packet['frame']))
+
+        # Grabar el frame (solo encola; escribe el hilo del recorder)
+        if self.recorder:
+            aperture = None
+            if packet['right'] and packet['left']:
+                aperture = (packet['right'][0], packet['left'][0])
+            self.recorder.record(packet['time'], face=packet['face'], aperture=aperture)
+
+        for name, seconds in self.profiler.take().items():
+            packet['stages'][name] = packet['stages'].get(name, 0.0) + seconds
+        return packet
+
+    def render(self, packet):
+        '''Dibuja puntos, gráfico y video de un paquete ya inferido (hilo de Tk).'''
+        frame = self.processor.draw(packet['frame'], packet)
+
+        if packet['right'] and packet['left']:
+            right_len, left_len = packet['right'][0], packet['left'][0]
 
             # Guardar datos
             if left_len and right_len:
-                self.left_data.append(left_len)
-                self.right_data.append(right_len)
-                if len(self.left_data) > self.max_points:
-                    self.left_data.pop(0)
-                    self.right_data.pop(0)
+                with self.profiler.stage('grafico'):
+                    self.plot.add(left_len, right_len)
 
-                # Actualizar gráfico
-                self.line_left.set_data(range(len(self.left_data)), self.left_data)
-                self.line_right.set_data(range(len(self.right_data)), self.right_data)
+                    # Actualizar gráfico
+                    self.plot.refresh()
 
-                
-                self.ax.set_xlim(0, self.max_points)    # Eje X dinámico
-                self.ax.set_ylim(0, 50)                 # Eje Y fijo
-
-                self.fig.tight_layout()
-                self.canvas.draw()
+        if self.hud:
+            self.profiler.draw_hud(frame)
 
         # Mostrar video en tkinter
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = ImageTk.PhotoImage(Image.fromarray(frame))
-        self.video_label.imgtk = img
-        self.video_label.configure(image=img)
+        with self.profiler.stage('tk'):
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            img = ImageTk.PhotoImage(Image.fromarray(frame))
+            self.video_label.imgtk = img
+            self.video_label.configure(image=img)
+
+        self.profiler.tick(packet['stages'])
+
+    def frame_time_summary(self) -> str:
+        '''FPS real y p50 / p95 por etapa en la ventana móvil del profiler.'''
+        return ' | '.join(self.profiler.hud_lines())
+
+    def update_video(self):
+        packet = self.capture_frame()
+        if packet is None:
+            self.root.after(10, self.update_video)
+            return
+
+        self.render(self.infer(packet))
+        self.stats_label.configure(text=self.frame_time_summary())
 
         # Loop
         self.root.after(10, self.update_video)
 
+    def update_pipeline(self):
+        # El loop de Tk solo dibuja el último resultado disponible
+        packet = self.pipeline.poll()
+        if packet is not None:
+            self.render(packet)
+            self.pipeline.mark_rendered(packet)
+            self.stats_label.configure(text=f'{self.frame_time_summary()} | {self.pipeline.summary()}')
+
+        self.root.after(5, self.update_pipeline)
+
+    def close(self):
+        if self.pipeline:
+            self.pipeline.stop()
+        try:
+            if self.recorder:
+                self.recorder.close()
+        finally:
+            if self.profile_path:
+                self.profiler.export(self.profile_path)
+            self.root.destroy()
+
     def __del__(self):
         if self.cap.isOpened():
             self.cap.release()
@@ -154,7 +406,7 @@ class EyeTrackerApp:
 if __name__ == '__main__':
     root = ctk.CTk()
     try:
-        app = EyeTrackerApp(root)
+        app = EyeTrackerApp(root, pipeline=True)
     except RuntimeError as exc:
         messagebox.showerror('Camera Error', str(exc))
         root.destroy()
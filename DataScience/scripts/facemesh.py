@@ -8,6 +8,9 @@ import customtkinter as ctk
 import numpy as np
 import platform
 
+import landmarks as lmk
+from instrumentation import NULL_TIMER, FrameProfiler
+
 ctk.set_appearance_mode('dark')
 ctk.set_default_color_theme('dark-blue')
 
@@ -25,9 +28,164 @@ FACIAL_LANDMARKS = {
     "Todo el rostro": list(range(468))  # todos los puntos
 }
 
+FACE_EDGES = lmk.edge_array(mp_face_mesh.FACEMESH_TESSELATION)
+
+
+def stamp_offsets(draw, size):
+    '''Píxeles (dy, dx) que pinta `draw(canvas, origen)`, relativos al origen.'''
+    canvas = np.zeros(size, dtype=np.uint8)
+    origin = (size[1] // 4, size[0] * 3 // 4)
+    draw(canvas, origin)
+    ys, xs = np.nonzero(canvas)
+    return np.stack([ys - origin[1], xs - origin[0]], axis=1).astype(np.int32)
+
+
+class MeshOverlay:
+    '''
+    MeshOverlay: dibujo de malla y etiquetas con costo acotado por frame.
+    - Teselación desde un arreglo de aristas precalculado, en una sola
+      llamada a cv2.polylines.
+    - La mezcla con transparencia se hace solo dentro del bounding box del
+      rostro, en el mismo frame (sin copiar el frame completo).
+    - Cada punto e índice se rasteriza una sola vez (cv2.circle / cv2.putText
+      sobre un lienzo chico) y se guarda como desplazamientos de píxeles; por
+      frame, todos los puntos y etiquetas se pintan con una sola asignación
+      numpy. Resultado idéntico a putText salvo el orden de superposición.
+    '''
+
+    def __init__(self, n_points: int = 468, alpha: float = 0.3):
+        self.alpha = alpha
+        self.dot = stamp_offsets(lambda c, o: cv2.circle(c, o, 2, 255, -1), (12, 12))
+        self.labels = [stamp_offsets(lambda c, o, i=i: cv2.putText(c, str(i), o, cv2.FONT_HERSHEY_SIMPLEX,
+                                                                   0.3, 255, 1), (16, 32))
+                       for i in range(n_points)]
+        self.cache = {}
+
+    def label_pixels(self, indices):
+        '''Desplazamientos de todas las etiquetas de `indices` y a qué punto pertenece cada uno.'''
+        key = tuple(indices)
+        if key not in self.cache:
+            offsets = [self.labels[i] for i in key]
+            owner = np.repeat(np.arange(len(key)), [len(o) for o in offsets])
+            self.cache = {key: (np.concatenate(offsets) if offsets else np.zeros((0, 2), np.int32), owner)}
+        return self.cache[key]
+
+    def paint(self, frame, points, offsets, owner, color):
+        # Píxeles absolutos (y, x) de todos los sellos, recortados al frame
+        yx = points[owner][:, ::-1] + offsets
+        h, w = frame.shape[:2]
+        keep = (yx[:, 0] >= 0) & (yx[:, 0] < h) & (yx[:, 1] >= 0) & (yx[:, 1] < w)
+        frame[yx[keep, 0], yx[keep, 1]] = color
+
+    def draw_mesh(self, frame, pixels):
+        h, w = frame.shape[:2]
+        x0, y0, x1, y1 = lmk.bbox(pixels)
+        x0, y0, x1, y1 = max(0, x0 - 1), max(0, y0 - 1), min(w, x1 + 2), min(h, y1 + 2)
+        if x1 <= x0 or y1 <= y0:
+            return frame
+
+        region = frame[y0:y1, x0:x1]
+        overlay = region.copy()
+        lmk.draw_edges(overlay, pixels - np.array([x0, y0], dtype=np.int32), FACE_EDGES, (50, 255, 50))
+        cv2.addWeighted(overlay, self.alpha, region, 1 - self.alpha, 0, dst=region)
+        return frame
+
+    def draw_points(self, frame, pixels, indices):
+        if not len(indices):
+            return frame
+        points = pixels[np.asarray(indices)]
+
+        # Puntos rojos
+        dot_owner = np.repeat(np.arange(len(points)), len(self.dot))
+        self.paint(frame, points, np.tile(self.dot, (len(points), 1)), dot_owner, (0, 0, 255))
+
+        # Índices en blanco, anclados en (x + 2, y - 2) como en putText
+        offsets, owner = self.label_pixels(indices)
+        self.paint(frame, points + (2, -2), offsets, owner, (255, 255, 255))
+        return frame
+
+
+class FaceMeshProcessor:
+    '''
+    FaceMeshProcessor: procesamiento por frame sin Tk, compartido por
+    FaceMeshApp y tracker_replay: resize, FaceMesh, malla semitransparente y
+    puntos con su índice. Cada etapa se mide con `timer` (ver instrumentation).
+    - fast=True: dibujo con MeshOverlay, a la resolución de pantalla `width`
+      (solo se reduce, nunca se amplía el frame de la cámara).
+    - fast=False: dibujo original con mp_drawing y putText, ampliado a 1400 px.
+    '''
+
+    def __init__(self, fast: bool = True, width: int = 960, timer=NULL_TIMER):
+        self.face_mesh = mp_face_mesh.FaceMesh(max_num_faces=1, refine_landmarks=True)
+        self.fast = fast
+        self.width = width
+        self.overlay = MeshOverlay() if fast else None
+        self.timer = timer
+
+    def step(self, frame, show_mesh: bool = True, indices=FACIAL_LANDMARKS["Todo el rostro"]):
+        '''Devuelve (frame dibujado, landmarks en píxeles o None si no hay rostro).'''
+        with self.timer.stage('resize'):
+            if not self.fast:
+                frame = imutils.resize(frame, width=1400)
+            elif frame.shape[1] > self.width:
+                frame = imutils.resize(frame, width=self.width, inter=cv2.INTER_AREA)
+        with self.timer.stage('color'):
+            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        with self.timer.stage('inferencia'):
+            results = self.face_mesh.process(frame_rgb)
+
+        h, w, _ = frame.shape
+        pixels = None
+
+        if results.multi_face_landmarks and self.fast:
+            pixels = lmk.to_pixels(lmk.to_array(results.multi_face_landmarks[0]), w, h)
+            if show_mesh:
+                with self.timer.stage('malla'):
+                    self.overlay.draw_mesh(frame, pixels)
+            with self.timer.stage('etiquetas'):
+                self.overlay.draw_points(frame, pixels, indices)
+
+        elif results.multi_face_landmarks:
+            face_landmarks = results.multi_face_landmarks[0]
+
+            # --- Dibujar malla si el checkbox está activo ---
+            if show_mesh:
+                with self.timer.stage('malla'):
+                    # --- Crear overlay vacío ---
+                    overlay = frame.copy()
+
+                    # Dibujar siempre la malla completa
+                    mp_drawing.draw_landmarks(
+                        overlay, face_landmarks,
+                        mp_face_mesh.FACEMESH_TESSELATION,
+                        landmark_drawing_spec=None,
+                        connection_drawing_spec=mp_drawing.DrawingSpec(color=(50, 255, 50), thickness=1, circle_radius=1)
+                    )
+
+                    # --- Mezclar con transparencia ---
+                    alpha = 0.3  # 0 = transparente, 1 = opaco
+                    frame = cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0)
+
+            # Dibujar puntos de la parte seleccionada
+            with self.timer.stage('etiquetas'):
+                pixels = lmk.to_pixels(lmk.to_array(face_landmarks), w, h)
+                for idx in indices:
+                    lx, ly = lmk.point(pixels, idx)
+                    cv2.circle(frame, (lx, ly), 2, (0, 0, 255), -1)
+                    cv2.putText(frame, str(idx), (lx + 2, ly - 2),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.3, (255, 255, 255), 1)
+
+        return frame, pixels
+
 
 class FaceMeshApp:
-    def __init__(self, root):
+    '''
+    FaceMeshApp: visor de la malla facial (ver FaceMeshProcessor).
+    - Tiempos por etapa con FrameProfiler: hud=True los dibuja sobre el video y
+      profile_path exporta CSV / JSON al cerrar la ventana.
+    '''
+
+    def __init__(self, root, fast: bool = True, hud: bool = False, profile_path: str = None):
         self.root = root
         self.root.title('Face Mesh Viewer')
 
@@ -89,12 +247,18 @@ class FaceMeshApp:
         self.cap.set(cv2.CAP_PROP_FPS, 30)
 
         # MediaPipe FaceMesh
-        self.face_mesh = mp_face_mesh.FaceMesh(max_num_faces=1, refine_landmarks=True)
+        # Se dibuja al ancho que cabe en pantalla, sin ampliar a 1400 px
+        display_width = min(1400, self.root.winfo_screenwidth() - 80)
+        self.profiler = FrameProfiler()
+        self.hud = hud
+        self.profile_path = profile_path
+        self.processor = FaceMeshProcessor(fast=fast, width=display_width, timer=self.profiler)
 
         # Mostrar sliders si aplica
         self.on_part_change(self.selected_part.get())
 
         # Loop principal
+        self.root.protocol('WM_DELETE_WINDOW', self.close)
         self.update_video()
     
     def on_part_change(self, value):
@@ -117,62 +281,40 @@ class FaceMeshApp:
         self.range_label.configure(text=f"Rango: {start} - {end}")
 
     def update_video(self):
-        ret, frame = self.cap.read()
+        with self.profiler.stage('captura'):
+            ret, frame = self.cap.read()
         if not ret:
             self.root.after(10, self.update_video)
             return
 
-        frame = imutils.resize(frame, width=1400)
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(frame_rgb)
-
-        h, w, _ = frame.shape
-
-        if results.multi_face_landmarks:
-            face_landmarks = results.multi_face_landmarks[0]
-
-            # --- Dibujar malla si el checkbox está activo ---
-            if self.show_mesh.get():
-                # --- Crear overlay vacío ---
-                overlay = frame.copy()
-                blank = np.zeros_like(frame)
-
-                # Dibujar siempre la malla completa
-                mp_drawing.draw_landmarks(
-                    overlay, face_landmarks,
-                    mp_face_mesh.FACEMESH_TESSELATION,
-                    landmark_drawing_spec=None,
-                    connection_drawing_spec=mp_drawing.DrawingSpec(color=(50, 255, 50), thickness=1, circle_radius=1)
-                )
-
-                # --- Mezclar con transparencia ---
-                alpha = 0.3  # 0 = transparente, 1 = opaco
-                frame = cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0)
+        # Puntos de la parte seleccionada
+        part = self.selected_part.get()
+        if part == "Todo el rostro":
+            start = min(self.range_start.get(), self.range_end.get())
+            end = max(self.range_start.get(), self.range_end.get())
+            indices = list(range(start, end + 1))
+        else:
+            indices = FACIAL_LANDMARKS.get(part, [])
 
-            # Dibujar puntos de la parte seleccionada
-            part = self.selected_part.get()
-            if part == "Todo el rostro":
-                start = min(self.range_start.get(), self.range_end.get())
-                end = max(self.range_start.get(), self.range_end.get())
-                indices = list(range(start, end + 1))
-            else:
-                indices = FACIAL_LANDMARKS.get(part, [])
-
-            for idx in indices:
-                lx = int(face_landmarks.landmark[idx].x * w)
-                ly = int(face_landmarks.landmark[idx].y * h)
-                cv2.circle(frame, (lx, ly), 2, (0, 0, 255), -1)
-                cv2.putText(frame, str(idx), (lx + 2, ly - 2),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.3, (255, 255, 255), 1)
+        frame, _ = self.processor.step(frame, self.show_mesh.get(), indices)
+        if self.hud:
+            self.profiler.draw_hud(frame)
 
         # Mostrar video en tkinter
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = ImageTk.PhotoImage(Image.fromarray(frame))
-        self.video_label.imgtk = img
-        self.video_label.configure(image=img)
+        with self.profiler.stage('tk'):
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            img = ImageTk.PhotoImage(Image.fromarray(frame))
+            self.video_label.imgtk = img
+            self.video_label.configure(image=img)
 
+        self.profiler.tick()
         self.root.after(10, self.update_video)
 
+    def close(self):
+        if self.profile_path:
+            self.profiler.export(self.profile_path)
+        self.root.destroy()
+
     def __del__(self):
         if self.cap.isOpened():
             self.cap.release()
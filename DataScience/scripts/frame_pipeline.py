@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class LatestQueue:
+    '''
+    LatestQueue:
+    - Cola acotada entre etapas del pipeline de video.
+    - Si está llena, put() descarta el elemento más viejo: el consumidor
+      siempre recibe el frame más reciente y la latencia no se acumula.
+    - dropped cuenta los frames descartados.
+    '''
+
+    def __init__(self, maxsize: int = 1):
+        self.items = deque(maxlen=maxsize)
+        self.cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self.cond:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+            self.items.append(item)
+            self.cond.notify()
+
+    def get(self, timeout: float = None):
+        '''Devuelve el elemento más viejo de la cola, o None si no llegó nada en `timeout`.'''
+        with self.cond:
+            if not self.items and not self.cond.wait_for(lambda: self.items, timeout):
+                return None
+            return self.items.popleft()
+
+    def get_nowait(self):
+        with self.cond:
+            return self.items.popleft() if self.items else None
+
+
+class RateMeter:
+    '''FPS de una etapa sobre los últimos `window` eventos.'''
+
+    def __init__(self, window: int = 60):
+        self.times = deque(maxlen=window)
+
+    def tick(self):
+        self.times.append(time.perf_counter())
+
+    @property
+    def fps(self) -> float:
+        if len(self.times) < 2:
+            return 0.0
+        return (len(self.times) - 1) / (self.times[-1] - self.times[0])
+
+
+class LatencyMeter:
+    '''Latencia extremo a extremo (captura → pantalla) sobre los últimos `window` frames.'''
+
+    def __init__(self, window: int = 120):
+        self.values = deque(maxlen=window)
+
+    def add(self, t_capture: float):
+        self.values.append(time.perf_counter() - t_capture)
+
+    def percentile(self, q: float) -> float:
+        '''Percentil q de la latencia, en milisegundos.'''
+        return float(np.percentile(self.values, q)) * 1000 if self.values else 0.0
+
+
+class StageThread(threading.Thread):
+    '''
+    Etapa del pipeline en su propio hilo:
+    - Toma un elemento de `source` (o nada, si es la primera etapa), aplica
+      `fn` y deja el resultado en `sink`. Si fn devuelve None, no publica nada.
+    - Termina cuando se activa `stop_event`.
+    '''
+
+    def __init__(self, name: str, fn, sink: LatestQueue, stop_event: threading.Event,
+                 source: LatestQueue = None):
+        super().__init__(name=name, daemon=True)
+        self.fn = fn
+        self.source = source
+        self.sink = sink
+        self.stop_event = stop_event
+        self.meter = RateMeter()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            if self.source is None:
+                out = self.fn()
+            else:
+                item = self.source.get(timeout=0.1)
+                if item is None:
+                    continue
+                out = self.fn(item)
+
+            if out is not None:
+                self.sink.put(out)
+                self.meter.tick()
+
+
+class FramePipeline:
+    '''
+    FramePipeline: captura → inferencia en hilos, con el render en el hilo de Tk.
+    - capture_fn() lee un frame y devuelve un paquete (dict con 't_capture').
+    - infer_fn(paquete) agrega los resultados del modelo al paquete.
+    - El hilo de Tk llama a poll() y dibuja lo que haya; mark_rendered()
+      registra el FPS de render y la latencia extremo a extremo.
+    '''
+
+    def __init__(self, capture_fn, infer_fn):
+        self.stop_event = threading.Event()
+        self.frames = LatestQueue()
+        self.results = LatestQueue()
+        self.stages = [
+            StageThread('captura', capture_fn, self.frames, self.stop_event),
+            StageThread('inferencia', infer_fn, self.results, self.stop_event, source=self.frames),
+        ]
+        self.render_meter = RateMeter()
+        self.latency = LatencyMeter()
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self, timeout: float = 1.0):
+        self.stop_event.set()
+        for stage in self.stages:
+            stage.join(timeout)
+
+    def poll(self):
+        return self.results.get_nowait()
+
+    def mark_rendered(self, packet):
+        self.render_meter.tick()
+        self.latency.add(packet['t_capture'])
+
+    def stats(self) -> dict:
+        stats = {f'{stage.name}_fps': round(stage.meter.fps, 1) for stage in self.stages}
+        stats['render_fps'] = round(self.render_meter.fps, 1)
+        stats['latency_p50_ms'] = round(self.latency.percentile(50), 1)
+        stats['latency_p95_ms'] = round(self.latency.percentile(95), 1)
+        stats['dropped'] = self.frames.dropped + self.results.dropped
+        return stats
+
+    def summary(self) -> str:
+        s = self.stats()
+        return (f"Captura {s['captura_fps']:.1f} fps | Inferencia {s['inferencia_fps']:.1f} fps | "
+                f"Render {s['render_fps']:.1f} fps | Latencia p50 {s['latency_p50_ms']:.0f} ms, "
+                f"p95 {s['latency_p95_ms']:.0f} ms | Descartados {s['dropped']}")
@@ -1,122 +1,335 @@
+import copy
+import random
+import time
+from collections import defaultdict
+
 import cv2
 import mediapipe as mp
-import math
 import tkinter as tk
 from PIL import Image, ImageTk
 
+import landmarks as lmk
+from instrumentation import NULL_TIMER, FrameProfiler
+
 # Configuración MediaPipe
 mp_hands = mp.solutions.hands
 mp_draw = mp.solutions.drawing_utils
 
-cap = cv2.VideoCapture(1, cv2.CAP_DSHOW)
-
-# Funciones auxiliares
-def distance(p1, p2):
-    return math.hypot(p1[0]-p2[0], p1[1]-p2[1])
-
-def rgb_to_photoimage(frame):
-    return ImageTk.PhotoImage(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
-
-# Tkinter ventana
-root = tk.Tk()
-root.title("AR File Mover")
-
 canvas_width, canvas_height = 640, 480
-canvas = tk.Canvas(root, width=canvas_width, height=canvas_height)
-canvas.pack()
 
 # Objetos: carpetas y archivos
-folders = [
+FOLDERS = [
     {"name": "Carpeta A", "x": 50, "y": 50, "w": 120, "h": 80, "color": "blue"},
     {"name": "Carpeta B", "x": 470, "y": 50, "w": 120, "h": 80, "color": "green"}
 ]
 
-files = [
+FILES = [
     {"name": "Archivo 1", "x": 250, "y": 300, "size": 40, "color": "red"},
     {"name": "Archivo 2", "x": 350, "y": 300, "size": 40, "color": "orange"}
 ]
 
-holding_file = None  # archivo que estamos sujetando
+# Funciones auxiliares
+def file_box(f):
+    """Caja (x_min, y_min, x_max, y_max) en la que la mano agarra el archivo f."""
+    return f["x"]-f["size"], f["y"]-f["size"], f["x"]+f["size"], f["y"]+f["size"]
 
-# Loop principal
-with mp_hands.Hands(max_num_hands=1, min_detection_confidence=0.7) as hands:
+def folder_box(f):
+    return f["x"], f["y"], f["x"]+f["w"], f["y"]+f["h"]
 
-    def loop():
-        global holding_file
+def make_files(n, seed=0):
+    """n archivos en posiciones aleatorias, para probar la escena con cientos de objetos."""
+    rng = random.Random(seed)
+    colors = ["red", "orange", "purple", "brown", "magenta"]
+    return [{"name": f"Archivo {i + 1}",
+             "x": rng.randint(20, canvas_width - 20), "y": rng.randint(150, canvas_height - 20),
+             "size": 15, "color": colors[i % len(colors)]} for i in range(n)]
 
-        ret, frame = cap.read()
-        if not ret:
-            root.after(10, loop)
+class SpatialGrid:
+    """
+    Índice espacial de grilla uniforme:
+    - Cada objeto (por su clave) se registra en todas las celdas que toca su caja.
+    - query(x, y) devuelve solo las claves de la celda del punto, así el hit
+      test no depende de cuántos objetos haya en el resto del canvas.
+    - move() actualiza las celdas de un objeto cuando cambia su caja.
+    """
+
+    def __init__(self, cell_size=80):
+        self.cell_size = cell_size
+        self.cells = defaultdict(set)
+        self.item_cells = {}
+
+    def cells_of(self, box):
+        x_min, y_min, x_max, y_max = box
+        c = self.cell_size
+        return [(cx, cy) for cx in range(int(x_min // c), int(x_max // c) + 1)
+                         for cy in range(int(y_min // c), int(y_max // c) + 1)]
+
+    def insert(self, key, box):
+        cells = self.cells_of(box)
+        for cell in cells:
+            self.cells[cell].add(key)
+        self.item_cells[key] = cells
+
+    def remove(self, key):
+        for cell in self.item_cells.pop(key, []):
+            self.cells[cell].discard(key)
+            if not self.cells[cell]:
+                del self.cells[cell]
+
+    def move(self, key, box):
+        if self.item_cells.get(key) == self.cells_of(box):
             return
+        self.remove(key)
+        self.insert(key, box)
+
+    def query(self, x, y):
+        return self.cells.get((int(x // self.cell_size), int(y // self.cell_size)), set())
+
+def build_grid(items, box_fn, cell_size=80):
+    grid = SpatialGrid(cell_size)
+    for i, item in enumerate(items):
+        grid.insert(i, box_fn(item))
+    return grid
+
+def hit(grid, items, box_fn, point):
+    """Primer índice de items (en orden de la lista) cuya caja contiene estrictamente point, o None."""
+    x, y = point
+    for i in sorted(grid.query(x, y)):
+        x_min, y_min, x_max, y_max = box_fn(items[i])
+        if x_min < x < x_max and y_min < y < y_max:
+            return i
+    return None
+
+def detect_pinch(results, frame):
+    """Centro entre pulgar e índice y si están cerrados (agarrando); (None, False) sin mano."""
+    if not results.multi_hand_landmarks:
+        return None, False
+
+    h, w, _ = frame.shape
+    hand = lmk.to_pixels(lmk.hand_arrays(results)[0], w, h)
+
+    # Coordenadas pulgar e índice
+    thumb_pos = lmk.point(hand, 4)
+    index_pos = lmk.point(hand, 8)
+
+    # Centro de acnlaje
+    cx = int((thumb_pos[0] + index_pos[0]) / 2)
+    cy = int((thumb_pos[1] + index_pos[1]) / 2)
+    hand_center = (cx, cy)
+
+    # Distancia pulgar–índice
+    d = lmk.distances(hand, [4], [8])[0]
+    grab = d < 40  # mano cerrada = agarrando
+
+    # Dibujar landmarks
+    for lm in [thumb_pos, index_pos, hand_center]:
+        cv2.circle(frame, lm, 5, (255, 255, 0), -1)
+
+    return hand_center, grab
+
+def update_holding(files, holding, hand_center, grab, grid):
+    """
+    Mueve el archivo sujetado (índice en files) con la mano y decide si se
+    agarra o suelta uno. El hit test solo revisa la celda de la mano en grid.
+    """
+    if holding is not None and hand_center:
+        # Seguir la mano
+        f = files[holding]
+        f["x"], f["y"] = hand_center
+        grid.move(holding, file_box(f))
 
-        frame = cv2.flip(frame, 1)
-        h, w, _ = frame.shape
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    # Agarrar o soltar
+    if hand_center:
+        if grab and holding is None:
+            # Revisar si la mano está sobre algún archivo
+            return hit(grid, files, file_box, hand_center)
+        elif not grab:
+            return None  # soltar archivo
+
+    return holding
+
+class GestureProcessor:
+    """
+    Procesamiento por frame sin Tk, compartido por la app y tracker_replay:
+    espejo, detección de la mano, pinza pulgar-índice y lógica de agarrar /
+    soltar archivos. Cada etapa se mide con `timer` (ver instrumentation).
+    - Archivos y carpetas van en índices SpatialGrid: agarrar y soltar en una
+      carpeta cuesta lo mismo con 4 que con cientos de objetos.
+    - moved: índices de los archivos que cambiaron de posición en el último frame.
+    """
+
+    def __init__(self, files=None, folders=None, timer=NULL_TIMER, cell_size=80):
+        self.hands = mp_hands.Hands(max_num_hands=1, min_detection_confidence=0.7)
+        self.files = files if files is not None else copy.deepcopy(FILES)
+        self.folders = folders if folders is not None else FOLDERS
+        self.file_grid = build_grid(self.files, file_box, cell_size)
+        self.folder_grid = build_grid(self.folders, folder_box, cell_size)
+        self.holding = None
+        self.moved = []
+        self.timer = timer
+
+    @property
+    def holding_file(self):
+        return self.files[self.holding] if self.holding is not None else None
+
+    def process(self, frame):
+        """Devuelve (frame espejado y dibujado, centro de la mano o None, agarrando)."""
+        with self.timer.stage('color'):
+            frame = cv2.flip(frame, 1)
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
         # Procesar mano
-        results = hands.process(rgb_frame)
-        hand_center = None
-        grab = False
+        with self.timer.stage('inferencia'):
+            results = self.hands.process(rgb_frame)
+
+        with self.timer.stage('interaccion'):
+            hand_center, grab = detect_pinch(results, frame)
+            previous = self.holding
+            self.holding = update_holding(self.files, previous, hand_center, grab, self.file_grid)
 
-        if results.multi_hand_landmarks:
-            hand = results.multi_hand_landmarks[0]
+            self.moved = [previous] if previous is not None and hand_center else []
+            if previous is not None and self.holding is None:
+                self.drop(previous)
 
-            # Coordenadas pulgar e índice
-            thumb = hand.landmark[4]
-            index = hand.landmark[8]
-            thumb_pos = (int(thumb.x*w), int(thumb.y*h))
-            index_pos = (int(index.x*w), int(index.y*h))
+        return frame, hand_center, grab
 
-            # Centro de acnlaje
-            cx = int((thumb_pos[0] + index_pos[0]) / 2)
-            cy = int((thumb_pos[1] + index_pos[1]) / 2)
-            hand_center = (cx, cy)
+    def drop(self, i):
+        """Registra en f["folder"] la carpeta donde se soltó el archivo (None si fuera de todas)."""
+        f = self.files[i]
+        folder = hit(self.folder_grid, self.folders, folder_box, (f["x"], f["y"]))
+        f["folder"] = self.folders[folder]["name"] if folder is not None else None
 
-            # Distancia pulgar–índice
-            d = distance(thumb_pos, index_pos)
-            grab = d < 40  # mano cerrada = agarrando
+    def step(self, frame) -> dict:
+        """Un frame completo sin Tk; devuelve las señales de la interacción."""
+        _, hand_center, grab = self.process(frame)
+        return {
+            "hand_x": hand_center[0] if hand_center else None,
+            "hand_y": hand_center[1] if hand_center else None,
+            "grab": int(grab),
+            "holding": self.holding_file["name"] if self.holding_file else "",
+        }
 
-            # Dibujar landmarks
-            for lm in [thumb_pos, index_pos, hand_center]:
-                cv2.circle(frame, lm, 5, (255, 255, 0), -1)
+    def close(self):
+        self.hands.close()
 
-        # Limpiar canvas
-        canvas.delete("all")
+class Scene:
+    """
+    Escena en modo retenido sobre el canvas:
+    - Fondo, carpetas y archivos se crean una sola vez.
+    - El video se pega sobre el mismo PhotoImage (paste) en vez de crear
+      una imagen nueva por frame.
+    - move_files() solo mueve con canvas.coords los archivos indicados.
+    """
 
-        # Dibujar video de fondo
-        img = rgb_to_photoimage(frame)
-        canvas.imgtk = img
-        canvas.create_image(0, 0, anchor="nw", image=img)
+    def __init__(self, canvas, folders, files):
+        self.canvas = canvas
+        self.files = files
+        self.photo = None
+        self.background = canvas.create_image(0, 0, anchor="nw")
 
-        # Dibujar carpetas
+        # Carpetas
         for f in folders:
-            canvas.create_rectangle(f["x"], f["y"], f["x"]+f["w"], f["y"]+f["h"], fill=f["color"])
+            canvas.create_rectangle(*folder_box(f), fill=f["color"])
             canvas.create_text(f["x"]+f["w"]//2, f["y"]+f["h"]//2, text=f["name"], fill="white")
 
-        # Dibujar archivos
+        # Archivos: (óvalo, texto) por índice
+        self.file_items = []
         for f in files:
-            if holding_file == f and hand_center:
-                # Seguir la mano
-                f["x"], f["y"] = hand_center
-            canvas.create_oval(f["x"]-f["size"], f["y"]-f["size"],
-                               f["x"]+f["size"], f["y"]+f["size"],
-                               fill=f["color"])
-            canvas.create_text(f["x"], f["y"], text=f["name"], fill="white")
-
-        # Agarrar o soltar
-        if hand_center:
-            if grab and not holding_file:
-                # Revisar si la mano está sobre algún archivo
-                for f in files:
-                    if abs(f["x"] - hand_center[0]) < f["size"] and abs(f["y"] - hand_center[1]) < f["size"]:
-                        holding_file = f
-                        break
-            elif not grab:
-                holding_file = None  # soltar archivo
+            oval = canvas.create_oval(*file_box(f), fill=f["color"])
+            text = canvas.create_text(f["x"], f["y"], text=f["name"], fill="white")
+            self.file_items.append((oval, text))
+
+    def set_background(self, frame):
+        image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if self.photo is None or (self.photo.width(), self.photo.height()) != image.size:
+            self.photo = ImageTk.PhotoImage(image)
+            self.canvas.itemconfigure(self.background, image=self.photo)
+        else:
+            self.photo.paste(image)
+
+    def move_files(self, indices):
+        for i in indices:
+            f = self.files[i]
+            oval, text = self.file_items[i]
+            self.canvas.coords(oval, *file_box(f))
+            self.canvas.coords(text, f["x"], f["y"])
+            # El archivo sujetado queda encima del resto
+            self.canvas.tag_raise(oval)
+            self.canvas.tag_raise(text)
+
+def benchmark_hit_test(counts=(4, 100, 1000), queries=2000, seed=0):
+    """Tiempo por hit test: recorrido lineal de todos los archivos vs. SpatialGrid."""
+    rng = random.Random(seed)
+    points = [(rng.uniform(0, canvas_width), rng.uniform(0, canvas_height)) for _ in range(queries)]
+
+    for n in counts:
+        files = make_files(n, seed)
+        grid = build_grid(files, file_box)
+
+        start = time.perf_counter()
+        linear = [next((i for i, f in enumerate(files)
+                        if abs(f["x"] - x) < f["size"] and abs(f["y"] - y) < f["size"]), None)
+                  for x, y in points]
+        t_linear = (time.perf_counter() - start) / queries * 1e6
+
+        start = time.perf_counter()
+        indexed = [hit(grid, files, file_box, p) for p in points]
+        t_grid = (time.perf_counter() - start) / queries * 1e6
+
+        assert linear == indexed
+        print(f"{n:>5} archivos   lineal {t_linear:8.2f} us   grilla {t_grid:6.2f} us")
 
+def main(hud=False, profile_path=None, n_files=None):
+    """
+    App en vivo. Tiempos por etapa con FrameProfiler: hud=True los dibuja sobre
+    el video y profile_path exporta CSV / JSON al cerrar la ventana.
+    n_files: cantidad de archivos aleatorios (make_files) en lugar de FILES.
+    """
+    cap = cv2.VideoCapture(1, cv2.CAP_DSHOW)
+
+    # Tkinter ventana
+    root = tk.Tk()
+    root.title("AR File Mover")
+
+    canvas = tk.Canvas(root, width=canvas_width, height=canvas_height)
+    canvas.pack()
+
+    profiler = FrameProfiler()
+    files = make_files(n_files) if n_files else None
+    processor = GestureProcessor(files=files, timer=profiler)
+    scene = Scene(canvas, processor.folders, processor.files)
+
+    # Loop principal
+    def loop():
+        with profiler.stage("captura"):
+            ret, frame = cap.read()
+        if not ret:
+            root.after(10, loop)
+            return
+
+        frame, hand_center, grab = processor.process(frame)
+        if hud:
+            profiler.draw_hud(frame)
+
+        # Solo se actualizan el fondo y los archivos que se movieron
+        with profiler.stage("canvas"):
+            scene.set_background(frame)
+            scene.move_files(processor.moved)
+
+        profiler.tick()
         root.after(10, loop)
 
+    def close():
+        if profile_path:
+            profiler.export(profile_path)
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", close)
     loop()
     root.mainloop()
 
-cap.release()
+    processor.close()
+    cap.release()
+
+if __name__ == "__main__":
+    main()
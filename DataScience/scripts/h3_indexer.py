@@ -0,0 +1,114 @@
+import time
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import h3
+
+
+class H3Indexer:
+    '''
+    H3Indexer:
+    - Deduplica coordenadas (lat, lon) antes de indexar: cada punto distinto
+      se indexa una sola vez y el resultado se expande a todas las filas.
+    - Cachea celdas y centros con un LRU acotado (cache_size), útil cuando los
+      mismos puntos de estacionamiento se repiten entre snapshots y corridas.
+    - Calcula varias resoluciones en una sola pasada.
+    '''
+
+    def __init__(self, cache_size: int = 1_000_000):
+        self.cell = lru_cache(maxsize=cache_size)(h3.geo_to_h3)
+        self.center = lru_cache(maxsize=cache_size)(h3.h3_to_geo)
+
+    def index(self, lat, lon, resolutions=(9,)):
+        '''Devuelve {resolución: array de celdas}, alineado con lat/lon'''
+        # Pares (lat, lon) distintos: se factoriza cada eje y luego la combinación
+        lat_codes, lat_uniques = pd.factorize(np.asarray(lat))
+        lon_codes, lon_uniques = pd.factorize(np.asarray(lon))
+        codes, pairs = pd.factorize(lat_codes.astype(np.int64) * len(lon_uniques) + lon_codes)
+        u_lat = lat_uniques[pairs // len(lon_uniques)]
+        u_lon = lon_uniques[pairs % len(lon_uniques)]
+
+        cells = {}
+        for res in resolutions:
+            u_cells = np.array([self.cell(a, b, res) for a, b in zip(u_lat, u_lon)], dtype=object)
+            cells[res] = u_cells[codes]
+
+        return cells
+
+    def index_one(self, lat, lon, resolution: int = 9):
+        return self.index(lat, lon, (resolution,))[resolution]
+
+    def centers(self, cells):
+        '''Centros (lat, lon) de cada celda, calculados una vez por celda distinta'''
+        codes, uniques = pd.factorize(np.asarray(cells, dtype=object))
+        u_centers = np.array([self.center(c) for c in uniques], dtype=float).reshape(-1, 2)
+        return u_centers[codes, 0], u_centers[codes, 1]
+
+    def cache_info(self):
+        return {'cell': self.cell.cache_info(), 'center': self.center.cache_info()}
+
+
+# ---------------------
+# BENCHMARK
+# ---------------------
+
+def synthetic_points(n_rows: int = 1_000_000, n_spots: int = 20_000, seed: int = 0):
+    '''Puntos sintéticos: pocos estacionamientos que se repiten en muchos snapshots'''
+    rng = np.random.default_rng(seed)
+    spot_lat = 32.05 + rng.random(n_spots) * 0.1
+    spot_lon = 34.75 + rng.random(n_spots) * 0.1
+    spot = rng.integers(0, n_spots, n_rows)
+    return pd.DataFrame({'latitude': spot_lat[spot], 'longitude': spot_lon[spot]})
+
+
+def benchmark(n_rows: int = 1_000_000, resolution: int = 9):
+    df = synthetic_points(n_rows)
+    print(f'{n_rows:,} filas, {len(df.drop_duplicates()):,} coordenadas distintas\n')
+
+    def with_apply():
+        return df.apply(lambda row: h3.geo_to_h3(row['latitude'], row['longitude'], resolution), axis=1)
+
+    def with_vectorize():
+        return np.vectorize(h3.geo_to_h3)(df['latitude'].values, df['longitude'].values, resolution)
+
+    def with_list_comprehension():
+        return [h3.geo_to_h3(lat, lon, resolution) for lat, lon in zip(df['latitude'], df['longitude'])]
+
+    indexer = H3Indexer()
+
+    def with_indexer():
+        return indexer.index_one(df['latitude'], df['longitude'], resolution)
+
+    timings = {}
+    for name, fn in [('apply', with_apply), ('np.vectorize', with_vectorize),
+                     ('list comprehension', with_list_comprehension),
+                     ('H3Indexer (cache fría)', with_indexer),
+                     ('H3Indexer (cache caliente)', with_indexer)]:
+        start = time.perf_counter()
+        cells = fn()
+        timings[name] = time.perf_counter() - start
+        print(f'{name:<28} {timings[name]:>8.2f} s')
+
+    assert list(cells) == with_list_comprehension()
+
+    # Centros: h3_to_geo por fila vs. una vez por celda distinta
+    start = time.perf_counter()
+    [h3.h3_to_geo(c) for c in cells]
+    per_row = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexer.centers(cells)
+    cached = time.perf_counter() - start
+    print(f"\n{'h3_to_geo por fila':<28} {per_row:>8.2f} s")
+    print(f"{'H3Indexer.centers':<28} {cached:>8.2f} s")
+
+    # Varias resoluciones en una pasada
+    start = time.perf_counter()
+    H3Indexer().index(df['latitude'], df['longitude'], resolutions=(7, 8, 9))
+    print(f"{'H3Indexer res 7, 8, 9':<28} {time.perf_counter() - start:>8.2f} s")
+
+    return timings
+
+
+if __name__ == '__main__':
+    benchmark()
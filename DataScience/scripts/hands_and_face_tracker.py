@@ -4,9 +4,13 @@ import cv2
 import mediapipe as mp
 import imutils
 import customtkinter as ctk
-import numpy as np
-import math
 import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+import landmarks as lmk
+from instrumentation import NULL_TIMER, FrameProfiler
+from landmark_recorder import SeriesRecorder
 
 ctk.set_appearance_mode('dark')
 ctk.set_default_color_theme('dark-blue')
@@ -16,9 +20,242 @@ mp_face_mesh = mp.solutions.face_mesh
 mp_hands = mp.solutions.hands
 mp_drawing = mp.solutions.drawing_utils
 
+FACE_EDGES = lmk.edge_array(mp_face_mesh.FACEMESH_TESSELATION)
+HAND_EDGES = lmk.edge_array(mp_hands.HAND_CONNECTIONS)
+FACE_POINTS = 478  # FaceMesh con refine_landmarks=True (468 + iris)
+HAND_POINTS = 21
+
+
+class PointTrack:
+    '''
+    PointTrack: últimos puntos detectados de un objeto (rostro o mano) y la
+    velocidad de su centro en px/frame. Entre inferencias predice la posición
+    desplazando los puntos a velocidad constante; pasados `max_age` frames sin
+    detección, el objeto se da por perdido.
+    '''
+
+    def __init__(self, max_age: int):
+        self.max_age = max_age
+        self.clear()
+
+    def clear(self):
+        self.pixels = None
+        self.velocity = np.zeros(2, dtype=np.float32)
+        self.frame = -1
+
+    def update(self, pixels: np.ndarray, frame_idx: int):
+        if self.pixels is not None and frame_idx > self.frame:
+            shift = pixels.mean(axis=0) - self.pixels.mean(axis=0)
+            self.velocity = shift / (frame_idx - self.frame)
+        else:
+            self.velocity[:] = 0
+        self.pixels = pixels
+        self.frame = frame_idx
+
+    def predict(self, frame_idx: int):
+        if self.pixels is None or frame_idx - self.frame > self.max_age:
+            return None
+        return (self.pixels + self.velocity * (frame_idx - self.frame)).astype(np.int32)
+
+
+class HandsFaceProcessor:
+    '''
+    HandsFaceProcessor: procesamiento por frame sin Tk, compartido por
+    FaceMeshApp y tracker_replay. Devuelve el frame dibujado y cuántas manos
+    tienen su centro dentro del rostro.
+    - scheduled=False: ambos modelos en serie sobre el frame completo, cada frame.
+    - scheduled=True: FaceMesh y Hands corren en paralelo (MediaPipe libera el
+      GIL) y cada uno solo cada face_every / hands_every frames; entre
+      inferencias los puntos se predicen con PointTrack.
+    - roi=True: con un rostro conocido, ambos modelos corren sobre un recorte
+      alrededor del último face box (agrandado roi_margin por lado). Pensado
+      para cuando solo importa el KPI: manos lejos del rostro no se ven.
+    - face_pixels / hand_pixels: puntos en píxeles del último frame (None / lista vacía).
+    '''
+
+    def __init__(self, scheduled: bool = True, face_every: int = 2, hands_every: int = 1,
+                 roi: bool = False, roi_margin: float = 0.6, timer=NULL_TIMER):
+        self.face_mesh = mp_face_mesh.FaceMesh(max_num_faces=1, refine_landmarks=True)
+        self.hands = mp_hands.Hands(max_num_hands=2, min_detection_confidence=0.7)
+        self.timer = timer
+
+        # Planificación de inferencia
+        self.scheduled = scheduled
+        self.face_every = face_every
+        self.hands_every = hands_every
+        self.roi = roi
+        self.roi_margin = roi_margin
+        self.frame_idx = 0
+        self.face_track = PointTrack(max_age=2 * face_every)
+        self.hand_tracks = [PointTrack(max_age=2 * hands_every) for _ in range(2)]
+        self.pool = ThreadPoolExecutor(max_workers=2)
+        self.face_pixels = None
+        self.hand_pixels = []
+
+    def step(self, frame):
+        '''Un frame completo: (frame dibujado, manos en rostro).'''
+        with self.timer.stage('resize'):
+            frame = imutils.resize(frame, width=960)
+        with self.timer.stage('color'):
+            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        if self.scheduled:
+            return self.step_scheduled(frame, frame_rgb)
+        return self.step_serial(frame, frame_rgb)
+
+    def step_serial(self, frame, frame_rgb):
+        # Una etapa de cada tipo por frame, igual que step_scheduled
+        with self.timer.stage('inferencia'):
+            face_results = self.face_mesh.process(frame_rgb)
+            hand_results = self.hands.process(frame_rgb)
+        h, w, _ = frame.shape
+        face_box = None
+        self.face_pixels, self.hand_pixels = None, []
+        hands_in_face = 0
+
+        with self.timer.stage('dibujo'):
+            # Procesar rostro
+            if face_results.multi_face_landmarks:
+                face_landmarks = face_results.multi_face_landmarks[0]
+
+                # Bounding box rostro
+                self.face_pixels = lmk.to_pixels(lmk.to_array(face_landmarks), w, h)
+                face_box = lmk.bbox(self.face_pixels)
+                x_min, y_min, x_max, y_max = face_box
+
+                # Dibujar rostro
+                mp_drawing.draw_landmarks(frame, face_landmarks,
+                                          mp_face_mesh.FACEMESH_TESSELATION,
+                                          landmark_drawing_spec=None,
+                                          connection_drawing_spec=mp_drawing.DrawingSpec(color=(50, 255, 50),
+                                                                                          thickness=1,
+                                                                                          circle_radius=1))
+                if face_box:
+                    cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 255, 0), 2)
+
+            # Procesar manos
+            if hand_results.multi_hand_landmarks and face_box:
+                for hand_landmarks in hand_results.multi_hand_landmarks:
+                    # Centro mano
+                    hand = lmk.to_pixels(lmk.to_array(hand_landmarks), w, h)
+                    self.hand_pixels.append(hand)
+                    cx, cy = lmk.centroid(hand)
+                    cv2.circle(frame, (cx, cy), 10, (255, 0, 0), -1)
+
+                    # Dibujar malla mano
+                    mp_drawing.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
+
+                    # Chequear si centro está dentro de rostro
+                    if lmk.in_box((cx, cy), face_box)[0]:
+                        hands_in_face += 1
+
+        return frame, hands_in_face
+
+    def infer(self, frame_rgb, frame_idx: int):
+        '''
+        Corre los modelos que tocan en este frame, en paralelo, y actualiza los
+        tracks. Devuelve (puntos del rostro, [puntos de cada mano]) en píxeles
+        del frame completo, detectados o predichos.
+        '''
+        h, w, _ = frame_rgb.shape
+        run_face = frame_idx % self.face_every == 0 or self.face_track.predict(frame_idx) is None
+        run_hands = frame_idx % self.hands_every == 0
+
+        # Recorte alrededor del último rostro conocido (o frame completo)
+        x0, y0, x1, y1 = 0, 0, w, h
+        face_pixels = self.face_track.predict(frame_idx)
+        if self.roi and face_pixels is not None:
+            x0, y0, x1, y1 = lmk.roi_box(lmk.bbox(face_pixels), w, h, self.roi_margin)
+        crop = np.ascontiguousarray(frame_rgb[y0:y1, x0:x1])
+        offset = np.array([x0, y0], dtype=np.int32)
+
+        face_future = self.pool.submit(self.face_mesh.process, crop) if run_face else None
+        hands_future = self.pool.submit(self.hands.process, crop) if run_hands else None
+
+        if face_future:
+            face = lmk.face_array(face_future.result())
+            if face is not None:
+                self.face_track.update(lmk.to_pixels(face, x1 - x0, y1 - y0) + offset, frame_idx)
+            else:
+                self.face_track.clear()
+
+        if hands_future:
+            hands = [lmk.to_pixels(hand, x1 - x0, y1 - y0) + offset
+                     for hand in lmk.hand_arrays(hands_future.result())]
+            self.assign_hands(hands, frame_idx)
+
+        hands = [track.predict(frame_idx) for track in self.hand_tracks]
+        return self.face_track.predict(frame_idx), [p for p in hands if p is not None]
+
+    def assign_hands(self, hands: list, frame_idx: int):
+        '''
+        Actualiza hand_tracks con las manos detectadas (en píxeles). El orden de
+        MediaPipe cambia entre frames, así que cada mano va al track cuya
+        posición predicha está más cerca de su centro; las manos nuevas toman
+        un track libre y los tracks que quedan sin mano se limpian.
+        '''
+        predicted = [track.predict(frame_idx) for track in self.hand_tracks]
+        pairs = sorted((float(np.linalg.norm(hand.mean(axis=0) - p.mean(axis=0))), d, t)
+                       for d, hand in enumerate(hands)
+                       for t, p in enumerate(predicted) if p is not None)
+
+        assigned = {}   # mano detectada -> track
+        for _, d, t in pairs:
+            if d not in assigned and t not in assigned.values():
+                assigned[d] = t
+        free = [t for t in range(len(self.hand_tracks)) if t not in assigned.values()]
+        for d in range(len(hands)):
+            if d not in assigned and free:
+                t = free.pop(0)
+                self.hand_tracks[t].clear()     # sin velocidad heredada de otra mano
+                assigned[d] = t
+
+        for d, t in assigned.items():
+            self.hand_tracks[t].update(hands[d], frame_idx)
+        for t in free:
+            self.hand_tracks[t].clear()
+
+    def step_scheduled(self, frame, frame_rgb):
+        with self.timer.stage('inferencia'):
+            face_pixels, hands = self.infer(frame_rgb, self.frame_idx)
+        self.frame_idx += 1
+        self.face_pixels, self.hand_pixels = face_pixels, hands
+
+        with self.timer.stage('dibujo'):
+            face_box = None
+            if face_pixels is not None:
+                face_box = lmk.bbox(face_pixels)
+                lmk.draw_edges(frame, face_pixels, FACE_EDGES, (50, 255, 50))
+                cv2.rectangle(frame, face_box[:2], face_box[2:], (0, 255, 0), 2)
+
+            hands_in_face = 0
+            if hands and face_box:
+                centers = np.array([lmk.centroid(p) for p in hands])
+                for pixels, (cx, cy) in zip(hands, centers):
+                    cv2.circle(frame, (int(cx), int(cy)), 10, (255, 0, 0), -1)
+                    lmk.draw_edges(frame, pixels, HAND_EDGES, (255, 255, 255), 2)
+                hands_in_face = int(lmk.in_box(centers, face_box).sum())
+
+        return frame, hands_in_face
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+
 
 class FaceMeshApp:
-    def __init__(self, root):
+    '''
+    FaceMeshApp: rostro + manos con KPI de manos en el rostro (ver HandsFaceProcessor).
+    - Los segundos en rostro se acumulan con el tiempo real medido entre frames.
+    - Tiempos por etapa con FrameProfiler: hud=True los dibuja sobre el video y
+      profile_path exporta CSV / JSON al cerrar la ventana.
+    - record_path: graba cada frame con SeriesRecorder (ver landmark_recorder):
+      'face' (478, 2) y 'hands' (2, 21, 2) en píxeles del frame redimensionado,
+      y 'hands_in_face' (1,); NaN donde no hay detección.
+    '''
+
+    def __init__(self, root, scheduled: bool = True, face_every: int = 2, hands_every: int = 1,
+                 roi: bool = False, roi_margin: float = 0.6, hud: bool = False, profile_path: str = None,
+                 record_path: str = None):
         self.root = root
         self.root.title('Face Mesh + Hands Viewer')
 
@@ -56,87 +293,81 @@ class FaceMeshApp:
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
         self.cap.set(cv2.CAP_PROP_FPS, 30)
 
-        # FPS
-        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
         self.seconds_in_face = 0.0  # acumulador de segundos
 
+        # Instrumentación
+        self.profiler = FrameProfiler()
+        self.hud = hud
+        self.profile_path = profile_path
+
         # MediaPipe
-        self.face_mesh = mp_face_mesh.FaceMesh(max_num_faces=1, refine_landmarks=True)
-        self.hands = mp_hands.Hands(max_num_hands=2, min_detection_confidence=0.7)
+        self.processor = HandsFaceProcessor(scheduled, face_every, hands_every, roi, roi_margin,
+                                            timer=self.profiler)
+
+        # Grabación de la serie completa
+        self.recorder = None
+        if record_path:
+            self.recorder = SeriesRecorder(record_path, {'face': (FACE_POINTS, 2), 'hands': (2, HAND_POINTS, 2),
+                                                         'hands_in_face': (1,)})
 
         # Loop principal
+        self.root.protocol('WM_DELETE_WINDOW', self.close)
         self.update_video()
 
     def update_video(self):
-        ret, frame = self.cap.read()
+        with self.profiler.stage('captura'):
+            ret, frame = self.cap.read()
         if not ret:
             self.root.after(10, self.update_video)
             return
 
-        frame = imutils.resize(frame, width=960)
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        # Procesar rostro
-        face_results = self.face_mesh.process(frame_rgb)
-        h, w, _ = frame.shape
-        face_box = None
-
-        if face_results.multi_face_landmarks:
-            face_landmarks = face_results.multi_face_landmarks[0]
-
-            # Bounding box rostro
-            xs = [lm.x * w for lm in face_landmarks.landmark]
-            ys = [lm.y * h for lm in face_landmarks.landmark]
-            x_min, x_max = int(min(xs)), int(max(xs))
-            y_min, y_max = int(min(ys)), int(max(ys))
-            face_box = (x_min, y_min, x_max, y_max)
-
-            # Dibujar rostro
-            mp_drawing.draw_landmarks(frame, face_landmarks,
-                                      mp_face_mesh.FACEMESH_TESSELATION,
-                                      landmark_drawing_spec=None,
-                                      connection_drawing_spec=mp_drawing.DrawingSpec(color=(50, 255, 50),
-                                                                                      thickness=1,
-                                                                                      circle_radius=1))
-            if face_box:
-                cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 255, 0), 2)
-
-        # Procesar manos
-        hand_results = self.hands.process(frame_rgb)
-        hands_in_face = 0
+        t = time.time()
+        frame, hands_in_face = self.processor.step(frame)
+        if self.recorder:
+            self.record(t, hands_in_face)
+        self.show(frame, hands_in_face)
+        self.root.after(10, self.update_video)
 
-        if hand_results.multi_hand_landmarks and face_box:
-            for hand_landmarks in hand_results.multi_hand_landmarks:
-                # Centro mano
-                cx = int(np.mean([lm.x * w for lm in hand_landmarks.landmark]))
-                cy = int(np.mean([lm.y * h for lm in hand_landmarks.landmark]))
-                cv2.circle(frame, (cx, cy), 10, (255, 0, 0), -1)
+    def show(self, frame, hands_in_face: int):
+        if self.hud:
+            self.profiler.draw_hud(frame)
 
-                # Dibujar malla mano
-                mp_drawing.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
+        # Mostrar video
+        with self.profiler.stage('tk'):
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            img = ImageTk.PhotoImage(Image.fromarray(frame))
+            self.video_label.imgtk = img
+            self.video_label.configure(image=img)
 
-                # Chequear si centro está dentro de rostro
-                x_min, y_min, x_max, y_max = face_box
-                if x_min < cx < x_max and y_min < cy < y_max:
-                    hands_in_face += 1
+        # Tiempo real de este frame (no 1 / fps nominal: el loop puede ir más lento que la cámara)
+        frame_seconds = self.profiler.tick()
 
         # Acumular segundos si al menos una mano está en rostro
         if hands_in_face > 0:
-            self.seconds_in_face += 1 / self.fps
+            self.seconds_in_face += frame_seconds
 
         # Actualizar indicadores
         self.hands_value.configure(text=f"{hands_in_face}")
         self.seconds_value.configure(text=f"{self.seconds_in_face:.1f}")
 
-        # Mostrar video
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = ImageTk.PhotoImage(Image.fromarray(frame))
-        self.video_label.imgtk = img
-        self.video_label.configure(image=img)
-
-        self.root.after(10, self.update_video)
+    def record(self, t: float, hands_in_face: int):
+        '''Encola el frame en el recorder (la escritura va en su propio hilo).'''
+        hands = np.full((2, HAND_POINTS, 2), np.nan, dtype=np.float32)
+        for i, pixels in enumerate(self.processor.hand_pixels[:2]):
+            hands[i] = pixels
+        self.recorder.record(t, face=self.processor.face_pixels, hands=hands, hands_in_face=(hands_in_face,))
+
+    def close(self):
+        try:
+            if self.recorder:
+                self.recorder.close()
+        finally:
+            if self.profile_path:
+                self.profiler.export(self.profile_path)
+            self.root.destroy()
 
     def __del__(self):
+        self.processor.close()
         if self.cap.isOpened():
             self.cap.release()
 
@@ -0,0 +1,176 @@
+import csv
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+
+import cv2
+import numpy as np
+
+
+class StageTimer:
+    '''
+    StageTimer: tiempos por etapa con nombre.
+    - with timer.stage('inferencia'): ... registra la duración de ese bloque.
+    - window: cuántas muestras guardar por etapa (None = todas).
+    - summary() da, por etapa, frames, FPS equivalente y latencias p50/p95/p99.
+    '''
+
+    def __init__(self, window: int = None):
+        self.samples = defaultdict(lambda: deque(maxlen=window))
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        self.samples[name].append(seconds)
+
+    def summary(self) -> dict:
+        summary = {}
+        for name, values in list(self.samples.items()):
+            if not values:
+                continue
+            ms = np.array(values) * 1000
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            summary[name] = {
+                'frames': len(ms),
+                'fps': round(1000 / ms.mean(), 1) if ms.mean() else 0.0,
+                'p50_ms': round(p50, 2),
+                'p95_ms': round(p95, 2),
+                'p99_ms': round(p99, 2),
+            }
+        return summary
+
+    def print_summary(self):
+        print(f"{'etapa':<14} {'frames':>7} {'fps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for name, s in self.summary().items():
+            print(f"{name:<14} {s['frames']:>7} {s['fps']:>8.1f} {s['p50_ms']:>8.2f} "
+                  f"{s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f}")
+
+
+class NullTimer:
+    '''Timer que no mide nada: el costo por etapa es un nullcontext.'''
+
+    def stage(self, name: str):
+        return nullcontext()
+
+
+NULL_TIMER = NullTimer()
+
+
+class FrameProfiler(StageTimer):
+    '''
+    FrameProfiler: instrumentación de las apps en vivo.
+    - Etapas con nombre (captura, color, inferencia, dibujo, tk, ...) sobre una
+      ventana móvil de `window` frames; seguro entre hilos.
+    - tick() cierra cada frame y devuelve el tiempo real desde el anterior
+      (para acumular KPIs en segundos medidos, no en 1 / fps nominal).
+    - Los tiempos de cada frame se acumulan por hilo. Con etapas en otros
+      hilos (FramePipeline), cada hilo los saca con take() y los pasa en el
+      paquete del frame hasta tick(stages): así cada fila es un solo frame,
+      aunque la captura o la inferencia hayan procesado frames descartados.
+    - histograms(): conteos por rango de ms de cada etapa en la ventana.
+    - draw_hud(frame): FPS y p50/p95 por etapa dibujados sobre el video.
+    - export_csv() (una fila por frame) y export_json() (resumen + histogramas).
+    '''
+
+    HIST_EDGES_MS = [0, 1, 2, 5, 10, 20, 33, 50, 100, 200, float('inf')]
+
+    def __init__(self, window: int = 300, history: int = 10_000):
+        super().__init__(window)
+        self.lock = threading.Lock()
+        self.rows = deque(maxlen=history)
+        self.current = defaultdict(lambda: defaultdict(float))  # hilo -> etapa -> segundos
+        self.last_tick = None
+        self.frame_idx = 0
+
+    def record(self, name: str, seconds: float):
+        with self.lock:
+            self.samples[name].append(seconds)
+            self.current[threading.get_ident()][name] += seconds
+
+    def take(self) -> dict:
+        '''Tiempos por etapa que acumuló el hilo que llama desde su último take() / tick(); los reinicia.'''
+        with self.lock:
+            return dict(self.current.pop(threading.get_ident(), {}))
+
+    def tick(self, stages: dict = None) -> float:
+        '''
+        Cierra el frame actual; devuelve los segundos reales desde el frame anterior.
+        La fila del frame suma las etapas de este hilo y `stages` (las que
+        otros hilos midieron para este mismo frame, ver take()).
+        '''
+        now = time.perf_counter()
+        delta = 0.0 if self.last_tick is None else now - self.last_tick
+        self.last_tick = now
+
+        frame_stages = self.take()
+        for name, seconds in (stages or {}).items():
+            frame_stages[name] = frame_stages.get(name, 0.0) + seconds
+
+        with self.lock:
+            if delta:
+                self.samples['frame'].append(delta)
+            row = {'frame': self.frame_idx, 'time': round(now, 4), 'frame_ms': round(delta * 1000, 3)}
+            row.update({f'{name}_ms': round(s * 1000, 3) for name, s in frame_stages.items()})
+            self.rows.append(row)
+            self.frame_idx += 1
+
+        return delta
+
+    def histograms(self) -> dict:
+        edges = np.array(self.HIST_EDGES_MS)
+        with self.lock:
+            samples = {name: np.array(values) * 1000 for name, values in self.samples.items()}
+        return {name: np.histogram(ms, bins=edges)[0].tolist() for name, ms in samples.items()}
+
+    def hud_lines(self) -> list:
+        with self.lock:
+            summary = self.summary()
+        lines = []
+        if 'frame' in summary:
+            lines.append(f"{summary['frame']['fps']:.1f} fps")
+        for name, s in summary.items():
+            if name != 'frame':
+                lines.append(f"{name}: {s['p50_ms']:.1f} / {s['p95_ms']:.1f} ms")
+        return lines
+
+    def draw_hud(self, frame):
+        '''Dibuja el HUD (FPS y p50 / p95 por etapa) en la esquina superior izquierda.'''
+        for i, line in enumerate(self.hud_lines()):
+            y = 18 + i * 16
+            cv2.putText(frame, line, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 3)
+            cv2.putText(frame, line, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 255), 1)
+        return frame
+
+    def export_csv(self, path: str):
+        with self.lock:
+            rows = list(self.rows)
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def export_json(self, path: str):
+        with self.lock:
+            summary = self.summary()
+        data = {
+            'frames': self.frame_idx,
+            'stages': summary,
+            'histogram_edges_ms': self.HIST_EDGES_MS[:-1] + ['inf'],
+            'histograms': self.histograms(),
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+    def export(self, path_prefix: str):
+        '''Escribe {path_prefix}.csv y {path_prefix}.json.'''
+        self.export_csv(f'{path_prefix}.csv')
+        self.export_json(f'{path_prefix}.json')
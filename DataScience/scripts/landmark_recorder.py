@@ -0,0 +1,249 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# -----------------------------------------------
+# Grabación de series por frame (landmarks y señales)
+# -----------------------------------------------
+# Formato en disco de una grabación (una carpeta):
+#   meta.json              streams y su forma por frame
+#   index.jsonl            una línea por segmento (append-only)
+#   t_00000.npy            tiempos (float64, segundos epoch) del segmento 0
+#   <stream>_00000.npy     valores float32 (frames, *forma) del segmento 0
+# Cada segmento es un .npy común: se lee sin copiar con np.load(mmap_mode='r').
+
+
+class SeriesRecorder:
+    '''
+    SeriesRecorder: graba series por frame en segmentos .npy append-only.
+    - streams: {'nombre': forma por frame}, p. ej. {'face': (478, 3), 'aperture': (2,)}.
+    - record(t, **valores) solo encola (sin bloquear el hilo de Tk); un hilo
+      aparte llena bloques float32 preasignados y escribe un segmento cada
+      chunk_frames frames. Valores faltantes (None o sin pasar) quedan en NaN.
+    - Si la cola se llena (disco lento) el frame se descarta y cuenta en dropped.
+    - Si el hilo de escritura falla (p. ej. un arreglo con otra forma), la
+      grabación se detiene: record() deja de encolar y close() re-lanza el error.
+    - Un segmento se escribe a un .tmp y se renombra antes de entrar al índice:
+      si el proceso se corta, todo lo indexado es legible.
+    - Sobre una carpeta existente con los mismos streams, sigue agregando.
+    '''
+
+    def __init__(self, path: str, streams: dict, chunk_frames: int = 1800, max_queue: int = 600):
+        if 't' in streams:
+            raise ValueError("'t' es el stream de tiempos, usa otro nombre")
+        self.path = path
+        self.streams = {name: tuple(shape) for name, shape in streams.items()}
+        self.chunk_frames = chunk_frames
+        self.dropped = 0
+        self.error = None
+
+        os.makedirs(path, exist_ok=True)
+        self.segment, self.frames = self.resume()
+
+        # Bloque en memoria del segmento actual
+        self.times = np.empty(chunk_frames, dtype=np.float64)
+        self.blocks = {name: np.full((chunk_frames, *shape), np.nan, dtype=np.float32)
+                       for name, shape in self.streams.items()}
+        self.rows = 0
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = threading.Thread(target=self.run, name='recorder', daemon=True)
+        self.thread.start()
+
+    def resume(self) -> tuple:
+        '''Escribe meta.json o valida el existente; devuelve (próximo segmento, frames ya grabados).'''
+        meta_path = os.path.join(self.path, 'meta.json')
+        meta = {'streams': {name: list(shape) for name, shape in self.streams.items()},
+                'dtype': 'float32', 'chunk_frames': self.chunk_frames}
+
+        if not os.path.exists(meta_path):
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, indent=2)
+            return 0, 0
+
+        with open(meta_path, encoding='utf-8') as f:
+            existing = json.load(f)
+        if existing['streams'] != meta['streams']:
+            raise ValueError(f'{self.path} ya tiene otros streams: {existing["streams"]}')
+
+        entries = read_index(self.path)
+        if not entries:
+            return 0, 0
+        last = entries[-1]
+        return last['segment'] + 1, last['start'] + last['frames']
+
+    def record(self, t: float = None, **values):
+        '''
+        Encola un frame: t (segundos epoch, por defecto ahora) y un arreglo por
+        stream. Los arreglos se copian en el hilo de escritura: no modificarlos después.
+        '''
+        if self.error is not None:
+            return
+        item = (time.time() if t is None else t, values)
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    break
+
+                t, values = item
+                row = self.rows
+                self.times[row] = t
+                for name, block in self.blocks.items():
+                    value = values.get(name)
+                    if value is not None:
+                        block[row] = value
+                self.rows += 1
+
+                if self.rows == self.chunk_frames:
+                    self.flush()
+
+            self.flush()
+        except Exception as error:
+            # Lo ya indexado queda legible; el resto del bloque se pierde
+            self.error = error
+            log.error('Grabación detenida en %s: %r', self.path, error)
+
+    def flush(self):
+        '''Escribe el bloque actual como un segmento y lo agrega al índice (hilo de escritura).'''
+        n = self.rows
+        if not n:
+            return
+
+        save_segment(self.path, 't', self.segment, self.times[:n])
+        for name, block in self.blocks.items():
+            save_segment(self.path, name, self.segment, block[:n])
+            block[:n] = np.nan
+
+        entry = {'segment': self.segment, 'start': self.frames, 'frames': n,
+                 't_start': float(self.times[0]), 't_end': float(self.times[n - 1])}
+        with open(os.path.join(self.path, 'index.jsonl'), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+
+        self.segment += 1
+        self.frames += n
+        self.rows = 0
+
+    def close(self, timeout: float = 10.0):
+        '''
+        Escribe lo que quede en cola y el último segmento parcial. Re-lanza el
+        error del hilo de escritura, si lo hubo.
+        '''
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass    # hilo de escritura caído (cola sin consumir) o disco muy lento
+        self.thread.join(timeout)
+
+        if self.error is not None:
+            raise self.error
+        if self.thread.is_alive():
+            raise TimeoutError(f'La grabación en {self.path} no terminó de escribirse en {timeout} s')
+
+
+def segment_path(path: str, stream: str, segment: int) -> str:
+    return os.path.join(path, f'{stream}_{segment:05d}.npy')
+
+
+def save_segment(path: str, stream: str, segment: int, values: np.ndarray):
+    final = segment_path(path, stream, segment)
+    tmp = final + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.save(f, values)
+    os.replace(tmp, final)
+
+
+def read_index(path: str) -> list:
+    index_path = os.path.join(path, 'index.jsonl')
+    if not os.path.exists(index_path):
+        return []
+    with open(index_path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class Recording:
+    '''
+    Recording: lectura de una carpeta grabada por SeriesRecorder.
+    - segments(stream): arreglos memory-mapped (sin copia) de cada segmento.
+    - load(stream, start, stop): frames [start, stop) concatenados; solo lee
+      los segmentos que tocan ese rango.
+    - 't' es el stream de tiempos; streams lista el resto con su forma.
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.streams = {name: tuple(shape) for name, shape in meta['streams'].items()}
+        self.index = read_index(path)
+
+    def __len__(self) -> int:
+        return sum(entry['frames'] for entry in self.index)
+
+    def segment(self, stream: str, segment: int) -> np.ndarray:
+        return np.load(segment_path(self.path, stream, segment), mmap_mode='r')
+
+    def segments(self, stream: str):
+        for entry in self.index:
+            yield self.segment(stream, entry['segment'])
+
+    def load(self, stream: str, start: int = 0, stop: int = None) -> np.ndarray:
+        stop = len(self) if stop is None else min(stop, len(self))
+        parts = []
+        for entry in self.index:
+            seg_start, seg_stop = entry['start'], entry['start'] + entry['frames']
+            if seg_stop <= start or seg_start >= stop:
+                continue
+            values = self.segment(stream, entry['segment'])
+            parts.append(values[max(start, seg_start) - seg_start:min(stop, seg_stop) - seg_start])
+
+        if not parts:
+            shape = self.streams.get(stream, ())
+            return np.empty((0, *shape), dtype=np.float64 if stream == 't' else np.float32)
+        return np.concatenate(parts)
+
+
+def benchmark_recorder(path: str = 'grabacion_bench', n_frames: int = 30 * 60 * 5, face_points: int = 478):
+    '''
+    Costo de record() en el hilo que llama (lo que pagaría el loop de Tk) y
+    tamaño en disco de n_frames de landmarks del rostro + apertura de ojos.
+    '''
+    rng = np.random.default_rng(0)
+    face = rng.random((face_points, 3), dtype=np.float32)
+
+    recorder = SeriesRecorder(path, {'face': (face_points, 3), 'aperture': (2,)})
+    times = np.empty(n_frames)
+    for i in range(n_frames):
+        start = time.perf_counter()
+        recorder.record(aperture=(20.0, 21.0), face=face if i % 10 else None)
+        times[i] = time.perf_counter() - start
+    start = time.perf_counter()
+    recorder.close()
+    close_s = time.perf_counter() - start
+
+    size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+    recording = Recording(path)
+    print(f'{len(recording)} frames ({recorder.dropped} descartados), '
+          f'{size / 1e6:.1f} MB, {size / max(len(recording), 1) / 1e3:.1f} KB/frame')
+    print(f'record(): p50 {np.percentile(times, 50) * 1e6:.1f} us, '
+          f'p99 {np.percentile(times, 99) * 1e6:.1f} us; close() {close_s * 1000:.0f} ms')
+    return recording
+
+
+if __name__ == '__main__':
+    recording = benchmark_recorder()
+    aperture = recording.load('aperture')
+    print(f'Apertura media: {np.nanmean(aperture, axis=0)}')
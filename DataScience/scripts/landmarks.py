@@ -0,0 +1,92 @@
+import cv2
+import numpy as np
+
+# -----------------------------------------------
+# Landmarks de MediaPipe como arreglos numpy
+# -----------------------------------------------
+# Cada resultado se convierte una sola vez por frame en un arreglo (N, 3)
+# float32 con (x, y, z) normalizados; el resto son operaciones vectorizadas
+# sobre ese arreglo en lugar de recorrer objetos landmark en Python.
+
+
+def to_array(landmark_list) -> np.ndarray:
+    '''NormalizedLandmarkList → arreglo (N, 3) float32.'''
+    lms = landmark_list.landmark
+    flat = np.fromiter((v for lm in lms for v in (lm.x, lm.y, lm.z)),
+                       dtype=np.float32, count=3 * len(lms))
+    return flat.reshape(-1, 3)
+
+
+def face_array(results, face: int = 0):
+    '''Landmarks del rostro `face` de un resultado de FaceMesh, o None si no hay rostro.'''
+    faces = results.multi_face_landmarks
+    if not faces or face >= len(faces):
+        return None
+    return to_array(faces[face])
+
+
+def hand_arrays(results) -> list:
+    '''Landmarks de cada mano detectada por Hands (lista vacía si no hay manos).'''
+    return [to_array(hand) for hand in (results.multi_hand_landmarks or [])]
+
+
+def to_pixels(points: np.ndarray, w: int, h: int) -> np.ndarray:
+    '''Coordenadas normalizadas → píxeles (N, 2) int32, truncando como int().'''
+    return (points[:, :2] * (w, h)).astype(np.int32)
+
+
+def point(pixels: np.ndarray, idx: int) -> tuple:
+    '''Un punto como tupla de int de Python, lista para cv2.'''
+    x, y = pixels[idx]
+    return int(x), int(y)
+
+
+def bbox(pixels: np.ndarray) -> tuple:
+    '''(x_min, y_min, x_max, y_max) de un conjunto de puntos.'''
+    x_min, y_min = pixels.min(axis=0)
+    x_max, y_max = pixels.max(axis=0)
+    return int(x_min), int(y_min), int(x_max), int(y_max)
+
+
+def centroid(pixels: np.ndarray) -> tuple:
+    '''Centro (media) de un conjunto de puntos, en píxeles enteros.'''
+    cx, cy = pixels.mean(axis=0)
+    return int(cx), int(cy)
+
+
+def distances(pixels: np.ndarray, idx_a, idx_b) -> np.ndarray:
+    '''Distancias euclidianas entre los pares de landmarks (idx_a[i], idx_b[i]).'''
+    delta = pixels[np.asarray(idx_b)] - pixels[np.asarray(idx_a)]
+    return np.hypot(delta[:, 0], delta[:, 1])
+
+
+def eye_aperture(pixels: np.ndarray, top: int, bottom: int) -> float:
+    '''Apertura de un ojo: distancia entre su párpado superior e inferior.'''
+    return float(distances(pixels, [top], [bottom])[0])
+
+
+def roi_box(box: tuple, w: int, h: int, margin: float = 0.5) -> tuple:
+    '''box agrandado `margin` veces su tamaño por lado y recortado al frame.'''
+    x_min, y_min, x_max, y_max = box
+    dx, dy = int((x_max - x_min) * margin), int((y_max - y_min) * margin)
+    return max(0, x_min - dx), max(0, y_min - dy), min(w, x_max + dx), min(h, y_max + dy)
+
+
+def edge_array(connections) -> np.ndarray:
+    '''Conexiones de MediaPipe (p. ej. FACEMESH_TESSELATION) → arreglo (E, 2) de índices, ordenado.'''
+    return np.array(sorted(connections), dtype=np.int32).reshape(-1, 2)
+
+
+def draw_edges(frame: np.ndarray, pixels: np.ndarray, edges: np.ndarray, color, thickness: int = 1):
+    '''Dibuja todas las aristas en una sola llamada a cv2.polylines.'''
+    segments = pixels[edges].astype(np.int32, copy=False)  # (E, 2, 2)
+    cv2.polylines(frame, segments, False, color, thickness)
+    return frame
+
+
+def in_box(pixels: np.ndarray, box: tuple) -> np.ndarray:
+    '''Máscara de los puntos estrictamente dentro de box = (x_min, y_min, x_max, y_max).'''
+    x_min, y_min, x_max, y_max = box
+    pixels = np.atleast_2d(pixels)
+    return ((x_min < pixels[:, 0]) & (pixels[:, 0] < x_max) &
+            (y_min < pixels[:, 1]) & (pixels[:, 1] < y_max))
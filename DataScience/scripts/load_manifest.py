@@ -0,0 +1,87 @@
+import hashlib
+import os
+
+
+def file_hash(file_path: str, block_size: int = 1024 * 1024):
+    '''SHA-256 of the file content, read in blocks.'''
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class LoadManifest:
+    '''
+    LoadManifest:
+    - Records per (file, table): content hash, chunk size, committed chunks,
+      rows and status ('partial' or 'done'), in a state table of the target
+      database itself (see loader_engine.Backend).
+    - Each chunk's state row is written in the same transaction as the chunk,
+      so after a crash it points exactly at the last chunk that was committed.
+    - Lets a rerun skip finished loads and resume partial ones. Loading the
+      same file into another table is a separate load.
+    - If the file content changed since a previous load into the same table,
+      that load's rows are deleted before starting over. Rows carry no source
+      file, so this is refused when other files were loaded into that table.
+    '''
+
+    def __init__(self, backend, create_table: bool = True):
+        self.backend = backend
+        self.states = {}
+        # Parallel loaders create the state table once up front instead
+        if create_table:
+            backend.create_state_table()
+
+    def key(self, file_path, table_name):
+        return os.path.abspath(file_path), table_name
+
+    def start(self, file_path, table_name, chunk_size):
+        '''
+        Returns (content_hash, chunk_size, first_chunk) for a file and table,
+        or None if the same content was already loaded completely.
+        '''
+        key = self.key(file_path, table_name)
+        content_hash = file_hash(file_path)
+        state = self.backend.read_state(*key)
+
+        if state and state['content_hash'] == content_hash:
+            if state['status'] == 'done':
+                return None
+            # Resume with the chunk size the committed chunks were written with
+            self.states[key] = state
+            return content_hash, state['chunk_size'], state['chunks_committed']
+
+        new_state = {'file_path': key[0], 'table_name': table_name, 'content_hash': content_hash,
+                     'chunk_size': chunk_size, 'chunks_committed': 0, 'rows_committed': 0,
+                     'status': 'partial'}
+
+        if state:
+            others = self.backend.other_loads(*key)
+            if others:
+                raise RuntimeError(
+                    f"Content changed since the last load of {file_path}, but '{table_name}' also holds "
+                    f"rows from {len(others)} other file(s), e.g. {others[0]}. Delete this file's rows and "
+                    f"its {self.backend.STATE_TABLE} entry, then load it again.")
+            print(f"   ⚠ Content changed since the last load, deleting the rows in '{table_name}' "
+                  f"and starting over: {file_path}")
+
+        # Deleting the old rows and resetting the state happen in one transaction
+        self.backend.save_state(new_state, clear_table=bool(state))
+        self.states[key] = new_state
+        return content_hash, chunk_size, 0
+
+    def checkpoint(self, file_path, table_name, rows):
+        '''State after one more chunk of `rows` rows; hand it to Backend.insert_batch.'''
+        key = self.key(file_path, table_name)
+        state = dict(self.states[key])
+        state['chunks_committed'] += 1
+        state['rows_committed'] += rows
+        self.states[key] = state
+        return state
+
+    def finish(self, file_path, table_name):
+        key = self.key(file_path, table_name)
+        state = dict(self.states[key], status='done')
+        self.backend.save_state(state)
+        self.states[key] = state
@@ -1,7 +1,9 @@
-import sqlite3
 import pandas as pd
 import os
 
+from csv_schema import SchemaCache, reader_kwargs
+from loader_engine import LoaderEngine, SQLiteBackend
+
 class SQLiteLoader:
     def __init__(self, db_name: str, table_name: str, file_path: str):
         self.db_name = db_name
@@ -14,47 +16,51 @@ class SQLiteLoader:
         if not os.path.exists(db_folder):
             os.makedirs(db_folder)
             
-        self.conn = sqlite3.connect(os.path.join(db_folder, 'data.db'))
-        self.cursor = self.conn.cursor()
+        self.db_path = os.path.join(db_folder, 'data.db')
+        self.schema_cache = SchemaCache('schemas')
+        self.schema = self.schema_cache.get(table_name, file_path)
+        self.stats = None
+
+        # Tablas, tipos e inserts van por el engine compartido (loader_engine)
+        self.backend = SQLiteBackend(self.db_path)
+        self.engine = LoaderEngine(self.backend, schema_cache=self.schema_cache)
 
     def load_data(self):
-        '''Carga el dataset a dataframe'''
-        self.df = pd.read_csv(self.file_path, index_col=0).head(100)
+        '''Carga el dataset a dataframe (el engine convierte los tipos al insertar)'''
+        self.df = pd.read_csv(self.file_path, index_col=0, **reader_kwargs(self.schema)).head(100)
         print('Datos cargados desde el CSV.')
 
     def create_table(self):
-        '''Crea la tabla si no existe, detectando los tipos de datos desde el DataFrame'''
-        columns_types = []
-        for col, dtype in self.df.dtypes.items():
-            if 'int' in str(dtype):
-                col_type = 'INTEGER'
-            elif 'float' in str(dtype):
-                col_type = 'REAL'
-            else:
-                col_type = 'TEXT'
-            columns_types.append(f'{col} {col_type}')
-        create_query = f"CREATE TABLE IF NOT EXISTS {self.table_name} ({', '.join(columns_types)})"
-        
-        self.cursor.execute(create_query)
-        self.conn.commit()
+        '''Crea la tabla si no existe, usando el esquema inferido (y cacheado) del CSV'''
+        self.backend.create_table(self.table_name, [(col, self.schema[col]) for col in self.df.columns])
         print('Tabla creada o ya existente.')
 
     def insert_data(self):
-        '''Inserta los datos en la tabla'''
-        placeholders = ', '.join(['?' for _ in self.df.columns])
-        insert_query = f'INSERT INTO {self.table_name} VALUES ({placeholders})'
-        self.cursor.executemany(insert_query, self.df.values.tolist())
-        self.conn.commit()
+        '''Inserta los datos en la tabla, en una transacción (mismo camino que bulk_load)'''
+        self.stats = self.engine.insert_chunks(self.table_name, self.schema, [self.df])
         print('Datos insertados en la base de datos.')
 
+    def bulk_load(self, chunk_size: int = 50_000, indexes=()):
+        '''
+        Carga el CSV completo (sin el límite de 100 filas) por bloques de
+        chunk_size filas: una transacción por bloque, pragmas de carga masiva
+        e índices creados al final sobre las columnas indicadas.
+        '''
+        # Igual que index_col=0: la primera columna del CSV es el índice
+        usecols = pd.read_csv(self.file_path, nrows=0).columns.tolist()[1:]
+
+        engine = LoaderEngine(self.backend, chunk_size=chunk_size, schema_cache=self.schema_cache)
+        self.stats = engine.load_csv(self.file_path, self.table_name, indexes=indexes, usecols=usecols)
+
+        print(f"Carga masiva: {self.stats['rows']:,} filas en {self.stats['seconds']}s "
+              f"({self.stats['rows_per_sec']:,} filas/s).")
+
     def close_connection(self):
         '''Cierra la conexión con la base de datos'''
-        self.conn.close()
+        self.backend.close()
         print('Conexión cerrada.')
 
 # Uso del código
 db_loader = SQLiteLoader('data.db', 'dataset', 'DataScience/datasets/wine-reviews/winemag-data_first150k.csv')
-db_loader.load_data()
-db_loader.create_table()
-db_loader.insert_data()
+db_loader.bulk_load(chunk_size=50_000, indexes=['country', 'variety'])
 db_loader.close_connection()
@@ -0,0 +1,384 @@
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+import pandas as pd
+import psutil
+from tqdm import tqdm
+
+from csv_schema import SchemaCache, fit_chunk, parse_datetimes, reader_kwargs, sql_server_type, sqlite_type
+
+
+def to_records(df, datetimes_as_text=True):
+    '''Converts a DataFrame into DB-API rows (missing values as None).'''
+    out = df.astype(object)
+
+    if datetimes_as_text:
+        for col in df.columns:
+            if 'datetime' in str(df[col].dtype):
+                out[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+
+    return out.where(pd.notnull(out), None).values.tolist()
+
+
+# ---------------------
+# BACKENDS
+# ---------------------
+
+class Backend(ABC):
+    '''
+    Backend adapter used by LoaderEngine. Subclasses implement:
+    - sql_type(spec): SQL type for a csv_schema column spec.
+    - create_table(table_name, columns): columns is a list of (name, spec).
+    - create_state_table() and clear_table(table_name), for the load state
+      kept by load_manifest.LoadManifest.
+    - create_index(table_name, column), run once the data is in.
+    - alter_column(table_name, column, spec), used when a chunk needs a
+      wider type than the sample gave.
+    And may override begin_bulk() / end_bulk() to tune the session during a
+    bulk load.
+
+    The defaults below work on a DB-API cursor (self.cursor, qmark params):
+    insert_batch() commits a batch and, if given, its load state row in one
+    transaction, so a checkpoint never gets ahead of or behind the data.
+    '''
+
+    datetimes_as_text = True
+
+    # Load state table (one row per (file_path, table_name), see LoadManifest)
+    STATE_TABLE = 'load_manifest'
+    STATE_FIELDS = ['file_path', 'table_name', 'content_hash', 'chunk_size',
+                    'chunks_committed', 'rows_committed', 'status']
+
+    BEGIN, COMMIT, ROLLBACK = 'BEGIN', 'COMMIT', 'ROLLBACK'
+
+    def quote(self, name):
+        return f'"{name}"'
+
+    def insert_sql(self, table_name, columns):
+        sql_cols = ', '.join(self.quote(c) for c in columns)
+        placeholders = ', '.join(['?'] * len(columns))
+        return f'INSERT INTO {self.quote(table_name)} ({sql_cols}) VALUES ({placeholders})'
+
+    @contextmanager
+    def transaction(self):
+        self.cursor.execute(self.BEGIN)
+        try:
+            yield
+            self.cursor.execute(self.COMMIT)
+        except Exception:
+            self.cursor.execute(self.ROLLBACK)
+            raise
+
+    def insert_batch(self, table_name, columns, records, state=None):
+        with self.transaction():
+            self.cursor.executemany(self.insert_sql(table_name, columns), records)
+            if state:
+                self.write_state(state)
+
+    def read_state(self, file_path, table_name):
+        sql_cols = ', '.join(self.quote(c) for c in self.STATE_FIELDS)
+        self.cursor.execute(f'SELECT {sql_cols} FROM {self.quote(self.STATE_TABLE)} '
+                            f'WHERE file_path = ? AND table_name = ?', (file_path, table_name))
+        row = self.cursor.fetchone()
+        return dict(zip(self.STATE_FIELDS, row)) if row else None
+
+    def other_loads(self, file_path, table_name):
+        '''Files other than file_path with a load state for table_name.'''
+        self.cursor.execute(f'SELECT file_path FROM {self.quote(self.STATE_TABLE)} '
+                            f'WHERE table_name = ? AND file_path <> ?', (table_name, file_path))
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def write_state(self, state):
+        '''Replaces the state row of (file_path, table_name), inside the caller's transaction.'''
+        self.cursor.execute(f'DELETE FROM {self.quote(self.STATE_TABLE)} WHERE file_path = ? AND table_name = ?',
+                            (state['file_path'], state['table_name']))
+        self.cursor.execute(self.insert_sql(self.STATE_TABLE, self.STATE_FIELDS),
+                            [state[f] for f in self.STATE_FIELDS])
+
+    def save_state(self, state, clear_table=False):
+        '''Writes a state row in its own transaction, deleting the target's rows first if clear_table.'''
+        with self.transaction():
+            if clear_table:
+                self.clear_table(state['table_name'])
+            self.write_state(state)
+
+    def begin_bulk(self):
+        pass
+
+    def end_bulk(self):
+        pass
+
+    @abstractmethod
+    def sql_type(self, spec):
+        ...
+
+    @abstractmethod
+    def create_table(self, table_name, columns):
+        ...
+
+    @abstractmethod
+    def create_state_table(self):
+        ...
+
+    @abstractmethod
+    def clear_table(self, table_name):
+        ...
+
+    @abstractmethod
+    def create_index(self, table_name, column):
+        ...
+
+    @abstractmethod
+    def alter_column(self, table_name, column, spec):
+        ...
+
+    def close(self):
+        self.conn.close()
+
+
+class SQLServerBackend(Backend):
+    '''SQL Server through pyodbc, with fast_executemany.'''
+
+    BEGIN, COMMIT, ROLLBACK = 'BEGIN TRANSACTION', 'COMMIT TRANSACTION', 'ROLLBACK TRANSACTION'
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.cursor.fast_executemany = True
+
+    def quote(self, name):
+        return f'[{name}]'
+
+    def sql_type(self, spec):
+        return sql_server_type(spec)
+
+    def create_table(self, table_name, columns):
+        col_defs = ', '.join(f'{self.quote(c)} {self.sql_type(spec)}' for c, spec in columns)
+
+        self.cursor.execute(f'''
+        IF NOT EXISTS (
+            SELECT * FROM sysobjects
+            WHERE name = '{table_name}' AND xtype = 'U'
+        )
+        CREATE TABLE [{table_name}] ({col_defs});
+        ''')
+
+    def create_state_table(self):
+        self.cursor.execute(f'''
+        IF NOT EXISTS (
+            SELECT * FROM sysobjects
+            WHERE name = '{self.STATE_TABLE}' AND xtype = 'U'
+        )
+        CREATE TABLE [{self.STATE_TABLE}] (
+            [file_path] NVARCHAR(1000), [table_name] NVARCHAR(256), [content_hash] CHAR(64),
+            [chunk_size] INT, [chunks_committed] INT, [rows_committed] BIGINT, [status] VARCHAR(10)
+        );
+        ''')
+
+    def clear_table(self, table_name):
+        self.cursor.execute(f"IF OBJECT_ID(N'[{table_name}]', N'U') IS NOT NULL DELETE FROM [{table_name}]")
+
+    def create_index(self, table_name, column):
+        index_name = f'ix_{table_name}_{column}'
+        self.cursor.execute(f'''
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = '{index_name}')
+        CREATE INDEX [{index_name}] ON [{table_name}] ([{column}]);
+        ''')
+
+    def alter_column(self, table_name, column, spec):
+        self.cursor.execute(f'ALTER TABLE [{table_name}] ALTER COLUMN [{column}] {self.sql_type(spec)}')
+
+
+class SQLiteBackend(Backend):
+    '''
+    SQLite fast path:
+    - Manual transactions (isolation_level=None): exactly one per batch.
+    - Relaxed durability pragmas while the bulk load runs; the values in
+      effect before it are restored after.
+    - Indexes are created by LoaderEngine only once the data is in.
+    '''
+
+    BULK_PRAGMAS = {
+        'synchronous': 'OFF',
+        'journal_mode': 'MEMORY',
+        'temp_store': 'MEMORY',
+        'cache_size': '-262144',  # 256 MB
+    }
+
+    def __init__(self, db_path: str):
+        db_folder = os.path.dirname(db_path)
+
+        # Si la carpeta no existe, la crea
+        if db_folder and not os.path.exists(db_folder):
+            os.makedirs(db_folder)
+
+        self.conn = sqlite3.connect(db_path, isolation_level=None)
+        self.cursor = self.conn.cursor()
+        self.saved_pragmas = None
+
+    def sql_type(self, spec):
+        return sqlite_type(spec)
+
+    def set_pragmas(self, pragmas):
+        for name, value in pragmas.items():
+            self.cursor.execute(f'PRAGMA {name} = {value}')
+
+    def get_pragmas(self, names):
+        return {name: self.cursor.execute(f'PRAGMA {name}').fetchone()[0] for name in names}
+
+    def begin_bulk(self):
+        self.saved_pragmas = self.get_pragmas(self.BULK_PRAGMAS)
+        self.set_pragmas(self.BULK_PRAGMAS)
+
+    def end_bulk(self):
+        if self.saved_pragmas is not None:
+            self.set_pragmas(self.saved_pragmas)
+            self.saved_pragmas = None
+
+    def create_table(self, table_name, columns):
+        col_defs = ', '.join(f'{self.quote(c)} {self.sql_type(spec)}' for c, spec in columns)
+        self.cursor.execute(f'CREATE TABLE IF NOT EXISTS {self.quote(table_name)} ({col_defs})')
+
+    def create_state_table(self):
+        self.cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {self.quote(self.STATE_TABLE)} (
+            file_path TEXT, table_name TEXT, content_hash TEXT, chunk_size INTEGER,
+            chunks_committed INTEGER, rows_committed INTEGER, status TEXT
+        )''')
+
+    def clear_table(self, table_name):
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,))
+        if self.cursor.fetchone():
+            self.cursor.execute(f'DELETE FROM {self.quote(table_name)}')
+
+    def create_index(self, table_name, column):
+        index_name = f'ix_{table_name}_{column}'
+        self.cursor.execute(f'CREATE INDEX IF NOT EXISTS {self.quote(index_name)} '
+                            f'ON {self.quote(table_name)} ({self.quote(column)})')
+
+    def alter_column(self, table_name, column, spec):
+        # Type affinity: an INTEGER column already stores decimals and big ints
+        pass
+
+
+# ---------------------
+# ENGINE
+# ---------------------
+
+class LoaderEngine:
+    '''
+    LoaderEngine: the shared CSV → database core for every backend.
+    - Infers and caches the schema of each CSV (csv_schema.SchemaCache).
+    - Reads the CSV with explicit dtypes, streamed in chunks of `chunk_size`
+      rows (or whole, with streaming=False, then inserted in chunks).
+    - Hands each chunk to the backend as one transactional batch and, if a
+      manifest is given, checkpoints it in that same transaction so reruns
+      skip or resume the file.
+    - Creates the requested indexes only after all the data is in.
+    - Widens a column (and the cached schema) when a chunk does not fit the
+      sampled type, instead of failing after earlier chunks were committed.
+    - Returns rows/s, peak RSS and, per datetime column, how many values did
+      not parse and were loaded as NULL.
+    '''
+
+    def __init__(self, backend: Backend, chunk_size: int = 50_000,
+                 schema_cache: SchemaCache = None, manifest=None):
+        self.backend = backend
+        self.chunk_size = chunk_size
+        self.schema_cache = schema_cache or SchemaCache()
+        self.manifest = manifest
+
+    def load_csv(self, file_path, table_name=None, indexes=(), streaming=True, position=0, usecols=None):
+        table_name = table_name or os.path.splitext(os.path.basename(file_path))[0]
+        chunk_size, first_chunk = self.chunk_size, 0
+
+        if self.manifest:
+            checkpoint = self.manifest.start(file_path, table_name, chunk_size)
+            if checkpoint is None:
+                print(f"   ✔ '{table_name}' already loaded with this content, skipping.")
+                return None
+
+            _, chunk_size, first_chunk = checkpoint
+            if first_chunk:
+                print(f'   → Resuming at chunk {first_chunk} ({first_chunk * chunk_size:,} rows committed).')
+
+        schema = self.schema_cache.get(table_name, file_path)
+        kwargs = reader_kwargs(schema)
+        if usecols:
+            kwargs['usecols'] = usecols
+            kwargs['dtype'] = {c: t for c, t in kwargs['dtype'].items() if c in usecols}
+
+        if streaming:
+            # Committed rows are skipped by the parser, without type conversion
+            skiprows = range(1, 1 + first_chunk * chunk_size) if first_chunk else None
+            chunks = pd.read_csv(file_path, chunksize=chunk_size, skiprows=skiprows, **kwargs)
+        else:
+            df = pd.read_csv(file_path, **kwargs)
+            chunks = (df.iloc[i:i + chunk_size].copy() for i in range(first_chunk * chunk_size, len(df), chunk_size))
+
+        stats = self.insert_chunks(table_name, schema, chunks, file_path, position)
+
+        for column in indexes:
+            print(f"   → Creating index on '{table_name}.{column}'...")
+            self.backend.create_index(table_name, column)
+
+        if self.manifest:
+            self.manifest.finish(file_path, table_name)
+
+        return stats
+
+    def insert_chunks(self, table_name, schema, chunks, file_path=None, position=0):
+        process = psutil.Process()
+        peak_rss = process.memory_info().rss
+
+        columns = None
+        total_rows = 0
+        coerced = {}
+        start = time.perf_counter()
+
+        self.backend.begin_bulk()
+        try:
+            for chunk in tqdm(chunks, desc=f'   → {table_name}', position=position, leave=position == 0):
+                chunk = parse_datetimes(chunk, schema, coerced)
+                chunk, widened = fit_chunk(chunk, schema)
+
+                if columns is None:
+                    columns = chunk.columns.tolist()
+                    self.backend.create_table(table_name, [(c, schema[c]) for c in columns])
+
+                if widened:
+                    # The sample was too narrow: widen the table before inserting this chunk
+                    for column in widened:
+                        print(f"   → Widening '{table_name}.{column}' to {sql_server_type(schema[column])}.")
+                        self.backend.alter_column(table_name, column, schema[column])
+                    self.schema_cache.save(table_name, schema)
+
+                records = to_records(chunk, self.backend.datetimes_as_text)
+
+                # The chunk and its checkpoint are committed together
+                state = None
+                if self.manifest and file_path:
+                    state = self.manifest.checkpoint(file_path, table_name, len(records))
+                self.backend.insert_batch(table_name, columns, records, state)
+
+                total_rows += len(records)
+                peak_rss = max(peak_rss, process.memory_info().rss)
+        finally:
+            self.backend.end_bulk()
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            'rows': total_rows,
+            'seconds': round(elapsed, 2),
+            'rows_per_sec': round(total_rows / elapsed) if elapsed else 0,
+            'peak_rss_mb': round(peak_rss / (1024 * 1024), 1),
+            'coerced_datetimes': coerced,
+        }
+
+        print(f"   ✔ Inserted {total_rows:,} rows into '{table_name}' in {stats['seconds']}s "
+              f"({stats['rows_per_sec']:,} rows/s, peak RSS {stats['peak_rss_mb']} MB).")
+        for column, count in coerced.items():
+            print(f"   ⚠ {count:,} values in '{table_name}.{column}' did not parse as dates and were loaded as NULL.")
+        return stats
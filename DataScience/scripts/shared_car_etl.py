@@ -0,0 +1,408 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import h3
+from sqlalchemy import create_engine, text, Column, Integer, Float, String, DateTime, MetaData, Table, Text
+
+from h3_indexer import H3Indexer
+
+
+def parse_cars_list(s: pd.Series) -> pd.Series:
+    '''
+    Reemplazo seguro (sin eval) y vectorizado del parseo de cars_list:
+    convierte textos como "[101, 102]" en una fila por auto, conservando el
+    índice de la fila original. Valores nulos o listas vacías no generan filas.
+    '''
+    tokens = (s.astype(str)
+               .str.strip('[]')
+               .str.split(',')
+               .explode()
+               .str.strip()
+               .str.strip('\'"'))
+    return tokens[tokens.ne('') & ~tokens.isin(['nan', 'None'])]
+
+
+class ETL:
+    def __init__(self, db_name: str, output_table_name: str):
+        self.db_name = db_name
+        self.output_table_name = output_table_name
+
+        db_folder = 'databases'
+
+        # Si la carpeta no existe, la crea
+        if not os.path.exists(db_folder):
+            os.makedirs(db_folder)
+
+        db_path = os.path.join(db_folder, 'data.db')
+
+        self.engine = create_engine(f'sqlite:///{db_path}')
+        self.metadata = MetaData()
+        self.df = None
+        self.h3 = H3Indexer()
+
+        # Estado incremental (mismo archivo SQLite)
+        self.bookings_table = f'{output_table_name}_state_bookings'
+        self.cars_table = f'{output_table_name}_state_cars'
+        self.watermark_table = 'etl_watermarks'
+
+    def run(self):
+        self.extract()
+        self.transform()
+        self.load()
+
+    def run_incremental(self):
+        '''
+        Corrida incremental: extrae solo las filas posteriores al watermark,
+        combina su estado parcial con el estado persistido y hace upsert del
+        resumen únicamente para las celdas afectadas.
+        '''
+        self.create_state_tables()
+        watermark = self.read_watermark()
+
+        self.extract(since=watermark)
+        if self.df.empty:
+            print('Sin datos nuevos desde el último watermark.')
+            return
+
+        new_watermark = str(self.df['timestamp'].max())
+        print('Inicio de transformación incremental.')
+        bookings, cars = self.partial_state(self.df)
+
+        if bookings.empty:
+            # Ninguna fila nueva con total_cars >= 2: nada que resumir, pero el
+            # watermark avanza para no releer (y reprocesar) las mismas filas
+            with self.engine.begin() as conn:
+                self.write_watermark(conn, new_watermark)
+            print(f'Sin reservas nuevas que resumir. Watermark: {new_watermark}')
+            return
+
+        # Estado, resumen y watermark se actualizan en una sola transacción
+        with self.engine.begin() as conn:
+            n_months_before = self.count_months(conn)
+            self.merge_state(conn, bookings, cars)
+            n_months = self.count_months(conn)
+
+            if n_months != n_months_before:
+                # Un mes nuevo cambia Avg_Cars de todas las celdas
+                cells = pd.read_sql(text(f'SELECT DISTINCT h3_index FROM {self.bookings_table}'), conn)['h3_index']
+            else:
+                cells = pd.Series(pd.concat([bookings['h3_index'], cars['h3_index']]).unique())
+
+            state_bookings, state_cars = self.read_state(conn, cells)
+            self.df = self.summarize(state_bookings, state_cars, n_months=n_months)
+
+            self.create_table(bind=conn)
+            self.upsert_summary(conn, self.df)
+            self.write_watermark(conn, new_watermark)
+
+        print(f'Resumen actualizado para {len(self.df):,} celdas. Watermark: {new_watermark}')
+
+    def extract(self, since=None):
+        '''Extraer de base de datos (solo filas posteriores a `since`, si se indica)'''
+        print('Inicio de extracción de datos.')
+        query = '''
+        SELECT
+            latitude AS lat,
+            longitude AS long,
+            total_cars,
+            cars_list,
+            timestamp
+        FROM shared_car_locations
+        '''
+        params = {}
+        if since is not None:
+            query += ' WHERE timestamp > :since'
+            params['since'] = since
+
+        with self.engine.connect() as conn:
+            self.df = pd.read_sql(text(query), conn, params=params)
+            print(f'Datos extraidos correctamente ({len(self.df):,} filas).')
+
+    def transform(self):
+        '''
+        Transformación vectorizada: cars_list se parsea sin eval y se expande
+        (explode) para contar autos distintos con groupby, sin lambdas por grupo
+        ni sum(listas) cuadrático; celdas y centros H3 salen de H3Indexer.
+        '''
+        print('Inicio de transformación de datos.')
+        bookings, cars = self.partial_state(self.df)
+        self.df = self.summarize(bookings, cars)
+
+    def partial_state(self, df):
+        '''
+        Estado parcial mergeable por (h3_index, month): suma de reservas
+        (bookings) y una fila por auto distinto (cars). Dos estados parciales
+        se combinan sumando n_bookings y uniendo los autos.
+        '''
+        df = df[df['total_cars'] >= 2]
+
+        month = pd.to_datetime(df['timestamp']).dt.strftime('%Y-%m')
+        h3_index = self.h3.index_one(df['lat'], df['long'], 9)
+        df = pd.DataFrame({'h3_index': h3_index, 'month': month.values,
+                           'total_cars': df['total_cars'].values, 'cars_list': df['cars_list'].values})
+
+        keys = ['h3_index', 'month']
+        bookings = (df.groupby(keys, as_index=False)['total_cars'].sum()
+                      .rename(columns={'total_cars': 'n_bookings'}))
+
+        # Una fila por (h3_index, month, auto) distinto
+        cars = (df[keys]
+                .join(parse_cars_list(df['cars_list']).rename('car'), how='inner')
+                .drop_duplicates())
+
+        return bookings, cars
+
+    def summarize(self, bookings, cars, n_months=None):
+        '''Resumen por celda H3 a partir del estado (parcial o acumulado)'''
+        keys = ['h3_index', 'month']
+        df_month = bookings.set_index(keys)[['n_bookings']].round(1)
+        df_month['num_cars'] = cars.groupby(keys).size()
+        df_month['num_cars'] = df_month['num_cars'].fillna(0).astype(int)
+        df_month = df_month.reset_index()
+
+        n_months = n_months or df_month['month'].nunique()
+
+        df_group = df_month.groupby('h3_index').agg(num_cars=('num_cars', 'sum'),
+                                                    Avg_Bookings=('n_bookings', 'mean'))
+        df_group['Avg_Cars'] = (df_group.pop('num_cars') / n_months).round(1)
+        df_group['Avg_Bookings'] = df_group['Avg_Bookings'].round(1)
+
+        cars_by_cell = cars.drop_duplicates(['h3_index', 'car']).groupby('h3_index')['car']
+        df_group['Cars'] = cars_by_cell.agg(','.join)
+        df_group['Cars'] = df_group['Cars'].fillna('')
+        df_group['Num_Cars'] = cars_by_cell.size()
+        df_group['Num_Cars'] = df_group['Num_Cars'].fillna(0).astype(int)
+        df_group = df_group.reset_index()[['h3_index', 'Avg_Cars', 'Cars', 'Avg_Bookings', 'Num_Cars']]
+
+        # Centros H3: una llamada por celda única (con cache entre corridas)
+        df_group['latitude'], df_group['longitude'] = self.h3.centers(df_group['h3_index'])
+
+        return df_group
+
+    def create_state_tables(self):
+        '''Estado acumulado por (h3_index, month) y watermark de la extracción'''
+        with self.engine.begin() as conn:
+            conn.execute(text(f'''
+            CREATE TABLE IF NOT EXISTS {self.bookings_table} (
+                h3_index TEXT, month TEXT, n_bookings REAL,
+                PRIMARY KEY (h3_index, month)
+            )'''))
+            conn.execute(text(f'''
+            CREATE TABLE IF NOT EXISTS {self.cars_table} (
+                h3_index TEXT, month TEXT, car TEXT,
+                PRIMARY KEY (h3_index, month, car)
+            )'''))
+            conn.execute(text(f'''
+            CREATE TABLE IF NOT EXISTS {self.watermark_table} (
+                source TEXT PRIMARY KEY, last_timestamp TEXT
+            )'''))
+
+    def read_watermark(self):
+        with self.engine.connect() as conn:
+            return conn.execute(text(f'SELECT last_timestamp FROM {self.watermark_table} '
+                                     'WHERE source = :source'),
+                                {'source': self.output_table_name}).scalar()
+
+    def write_watermark(self, conn, timestamp):
+        conn.execute(text(f'''
+        INSERT INTO {self.watermark_table} (source, last_timestamp) VALUES (:source, :ts)
+        ON CONFLICT (source) DO UPDATE SET last_timestamp = excluded.last_timestamp
+        '''), {'source': self.output_table_name, 'ts': timestamp})
+
+    def count_months(self, conn):
+        return conn.execute(text(f'SELECT COUNT(DISTINCT month) FROM {self.bookings_table}')).scalar()
+
+    def merge_state(self, conn, bookings, cars):
+        '''Merge: las reservas se suman y los autos se unen (INSERT OR IGNORE)'''
+        if bookings.empty:
+            return
+
+        conn.execute(text(f'''
+        INSERT INTO {self.bookings_table} (h3_index, month, n_bookings)
+        VALUES (:h3_index, :month, :n_bookings)
+        ON CONFLICT (h3_index, month) DO UPDATE SET n_bookings = n_bookings + excluded.n_bookings
+        '''), bookings.to_dict('records'))
+
+        if not cars.empty:
+            conn.execute(text(f'INSERT OR IGNORE INTO {self.cars_table} (h3_index, month, car) '
+                              'VALUES (:h3_index, :month, :car)'),
+                         cars.to_dict('records'))
+
+    def read_state(self, conn, cells):
+        '''Lee el estado acumulado solo de las celdas indicadas'''
+        conn.execute(text('CREATE TEMP TABLE IF NOT EXISTS affected_cells (h3_index TEXT PRIMARY KEY)'))
+        conn.execute(text('DELETE FROM affected_cells'))
+        if len(cells):
+            conn.execute(text('INSERT INTO affected_cells (h3_index) VALUES (:h3_index)'),
+                         [{'h3_index': h} for h in cells])
+
+        bookings = pd.read_sql(text(f'SELECT h3_index, month, n_bookings FROM {self.bookings_table} '
+                                    'WHERE h3_index IN (SELECT h3_index FROM affected_cells)'), conn)
+        cars = pd.read_sql(text(f'SELECT h3_index, month, car FROM {self.cars_table} '
+                                'WHERE h3_index IN (SELECT h3_index FROM affected_cells)'), conn)
+        return bookings, cars
+
+    def upsert_summary(self, conn, df):
+        '''Upsert por h3_index: actualiza la fila existente en lugar de duplicarla'''
+        if df.empty:
+            return
+
+        table = self.output_table_name
+
+        # Corridas antiguas con append pudieron dejar duplicados: se conserva la última fila
+        conn.execute(text(f'DELETE FROM {table} WHERE id NOT IN '
+                          f'(SELECT MAX(id) FROM {table} GROUP BY h3_index)'))
+        conn.execute(text(f'CREATE UNIQUE INDEX IF NOT EXISTS ux_{table}_h3_index ON {table} (h3_index)'))
+
+        columns = df.columns.tolist()
+        sql_cols = ', '.join(f'"{c}"' for c in columns)
+        params = ', '.join(f':{c}' for c in columns)
+        updates = ', '.join(f'"{c}" = excluded."{c}"' for c in columns if c != 'h3_index')
+
+        conn.execute(text(f'''
+        INSERT INTO {table} ({sql_cols}) VALUES ({params})
+        ON CONFLICT (h3_index) DO UPDATE SET {updates}
+        '''), df.to_dict('records'))
+
+    def transform_legacy(self):
+        '''Transformación original (eval por fila y groupby.apply), usada como referencia'''
+        print('Inicio de transformación de datos.')
+        df = self.df.copy()
+        df = df[df['total_cars'] >= 2]
+
+        # Convertir a listas asegurando que todos los valores sean listas
+        df['cars_list'] = df['cars_list'].apply(lambda x:
+                                                eval(x) if isinstance(x, str)
+                                                else (x if isinstance(x, list) else []))
+
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df['month'] = df['timestamp'].dt.strftime('%Y-%m')
+
+        df['h3_index'] = [h3.geo_to_h3(lat, lon, 9) for lat, lon in zip(df['lat'],
+                                                                        df['long'])]
+
+        df_month = df.groupby(['h3_index', 'month']).apply(
+                        lambda group: pd.Series({
+                            'n_bookings': round(group['total_cars'].sum(), 1),
+                            'cars_list': list(set(sum(group['cars_list'], []))),
+                        }), include_groups=False
+                    ).reset_index()
+
+        df_month['num_cars'] = df_month['cars_list'].apply(len)
+
+        n_months = df_month['month'].nunique()
+
+        df_group = df_month.groupby(['h3_index']).apply(
+                        lambda group: pd.Series({
+                            'Avg_Cars': round(group['num_cars'].sum() / n_months, 1),
+                            'Cars': list(set(sum(group['cars_list'], []))),
+                            'Avg_Bookings': round(group['n_bookings'].mean(), 1),
+                        }), include_groups=False
+                    ).reset_index()
+
+        df_group['Cars'] = df_group['Cars'].apply(lambda x: ','.join(map(str, x)))
+        df_group['Num_Cars'] = df_group['Cars'].apply(len)
+
+        df_group['Center_Coordinates'] = df_group['h3_index'].apply(lambda x:
+                                                                    h3.h3_to_geo(x))
+
+        # Separate into columns of latitude and longitude
+        df_group['latitude'] = df_group['Center_Coordinates'].apply(lambda x: x[0])
+        df_group['longitude'] = df_group['Center_Coordinates'].apply(lambda x: x[1])
+        df_group = df_group.drop(columns=['Center_Coordinates'])
+
+        self.df = df_group
+
+    def load(self):
+        print('Inicio de carga de datos en la base de datos.')
+        self.create_table()
+
+        '''Inserta los datos en la tabla sin sobrescribir su estructura'''
+        # Convertir datetime a string ISO 8601 antes de insertar
+        for col in self.df.columns:
+            if self.df[col].dtype == 'datetime64[ns]':
+                self.df[col] = self.df[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+
+        with self.engine.begin() as conn:
+            self.upsert_summary(conn, self.df)
+        print('Datos insertados en la base de datos.')
+
+    def create_table(self, bind=None):
+        '''Crea la tabla con un índice autoincremental si no existe'''
+        columns = [
+            Column('id', Integer, primary_key=True, autoincrement=True)  # ID autoincremental
+        ]
+
+        # Inferir tipos de datos de Pandas a SQLAlchemy
+        for col, dtype in self.df.dtypes.items():
+            if 'int' in str(dtype):
+                col_type = Integer
+            elif 'float' in str(dtype):
+                col_type = Float
+            elif 'datetime' in str(dtype):
+                col_type = DateTime
+            elif self.df[col].str.len().gt(255).any():
+                col_type = Text
+            else:
+                col_type = String  # Cualquier otro tipo lo tratamos como texto
+
+            columns.append(Column(col, col_type))
+
+        # Definir la tabla
+        Table(self.output_table_name, self.metadata, *columns, extend_existing=True)
+
+        # Crear la tabla si no existe
+        self.metadata.create_all(bind or self.engine)
+        print(f"Tabla '{self.output_table_name}' creada o ya existente.")
+
+
+# ---------------------
+# BENCHMARK
+# ---------------------
+
+def synthetic_snapshots(n_rows: int = 2_000_000, n_spots: int = 20_000, n_cars: int = 3_000, seed: int = 0):
+    '''Snapshots sintéticos: pocos puntos de estacionamiento que se repiten mucho'''
+    rng = np.random.default_rng(seed)
+
+    spot_lat = 32.05 + rng.random(n_spots) * 0.1    # Tel Aviv aprox.
+    spot_lon = 34.75 + rng.random(n_spots) * 0.1
+    spot = rng.integers(0, n_spots, n_rows)
+
+    total_cars = rng.integers(0, 5, n_rows)
+    car_ids = rng.integers(0, n_cars, (n_rows, 4))
+    cars_list = [str(row[:k].tolist()) for row, k in zip(car_ids, total_cars)]
+
+    timestamps = pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 90 * 24 * 3600, n_rows), unit='s')
+
+    return pd.DataFrame({
+        'lat': spot_lat[spot],
+        'long': spot_lon[spot],
+        'total_cars': total_cars,
+        'cars_list': cars_list,
+        'timestamp': timestamps.astype(str),
+    })
+
+
+def benchmark(n_rows: int = 2_000_000):
+    print(f'Generando {n_rows:,} filas sintéticas...')
+    raw = synthetic_snapshots(n_rows)
+    etl = ETL(db_name='data.db', output_table_name='shared_car_locations_summary')
+
+    results = {}
+    for name, method in [('vectorizado', etl.transform), ('original', etl.transform_legacy)]:
+        etl.df = raw
+        start = time.perf_counter()
+        method()
+        results[name] = (time.perf_counter() - start, etl.df.set_index('h3_index').sort_index())
+        print(f'{name:<12} {results[name][0]:>8.2f} s')
+
+    fast, legacy = results['vectorizado'][1], results['original'][1]
+    for col in ['Avg_Cars', 'Avg_Bookings', 'latitude', 'longitude']:
+        assert np.allclose(fast[col], legacy[col]), col
+    print(f"Speedup: {results['original'][0] / results['vectorizado'][0]:.1f}x (resultados equivalentes)")
+
+
+if __name__ == '__main__':
+    etl = ETL(db_name='data.db', output_table_name='shared_car_locations_summary')
+    etl.run_incremental()
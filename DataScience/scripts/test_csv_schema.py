@@ -0,0 +1,58 @@
+import pandas as pd
+
+from csv_schema import SchemaCache, fit_chunk, sql_server_type
+from loader_engine import LoaderEngine, SQLiteBackend
+
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('id,flag,price,name\n')
+        f.writelines(f'{row}\n' for row in rows)
+
+
+def test_fit_chunk_widens_only_past_the_declared_type():
+    schema = {
+        'n': {'kind': 'int', 'min': 0, 'max': 10},
+        'flag': {'kind': 'bool'},
+        'name': {'kind': 'text', 'length': 10},
+    }
+    df = pd.DataFrame({'n': ['5', None], 'flag': ['True', None], 'name': ['a' * 20, 'b']}, dtype=object)
+    df, widened = fit_chunk(df, schema)
+
+    # 20 characters fit the VARCHAR(50) already declared: no ALTER needed
+    assert widened == []
+    assert str(df['n'].dtype) == 'Int64'
+    assert str(df['flag'].dtype) == 'boolean'
+
+    df = pd.DataFrame({'n': ['7'], 'flag': ['False'], 'name': ['a' * 60]}, dtype=object)
+    df, widened = fit_chunk(df, schema)
+    assert widened == ['name']
+    assert sql_server_type(schema['name']) == 'VARCHAR(90)'
+
+
+def test_drift_after_the_sample_widens_instead_of_failing(tmp_path):
+    csv_path = str(tmp_path / 'items.csv')
+    rows = [f'{i},true,{i}.5,item{i}' for i in range(20)]
+    rows += ['20,maybe,unknown,' + 'x' * 200, '3000000000,false,1.25,short']
+    write_csv(csv_path, rows)
+
+    cache = SchemaCache(str(tmp_path / 'schemas'), sample_rows=10)
+    backend = SQLiteBackend(str(tmp_path / 'data.db'))
+    engine = LoaderEngine(backend, chunk_size=5, schema_cache=cache)
+    try:
+        stats = engine.load_csv(csv_path, 'items')
+        drifted = backend.cursor.execute('SELECT flag, price, name FROM items WHERE id = 20').fetchone()
+        big_id = backend.cursor.execute('SELECT MAX(id) FROM items').fetchone()[0]
+    finally:
+        backend.close()
+
+    assert stats['rows'] == 22
+    assert drifted == ('maybe', 'unknown', 'x' * 200)
+    assert big_id == 3_000_000_000
+
+    # The widened schema is cached for the next load
+    schema = cache.get('items', csv_path)
+    assert schema['flag']['kind'] == 'text'
+    assert schema['price']['kind'] == 'text'
+    assert schema['name']['length'] == 200
+    assert sql_server_type(schema['id']) == 'BIGINT'
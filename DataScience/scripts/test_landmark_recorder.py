@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from landmark_recorder import Recording, SeriesRecorder, read_index
+
+STREAMS = {'face': (4, 3), 'aperture': (2,)}
+
+
+def record_frames(path, start, n_frames, chunk_frames=4):
+    '''Graba n_frames con t = start + i; sin rostro cada 3 frames.'''
+    recorder = SeriesRecorder(path, STREAMS, chunk_frames=chunk_frames)
+    for i in range(start, start + n_frames):
+        face = None if i % 3 == 0 else np.full((4, 3), i, dtype=np.float32)
+        recorder.record(float(i), face=face, aperture=(i, -i))
+    recorder.close()
+    assert recorder.dropped == 0
+
+
+def test_round_trip_with_gaps(tmp_path):
+    path = str(tmp_path / 'rec')
+    record_frames(path, 0, 10)
+
+    recording = Recording(path)
+    assert len(recording) == 10
+    assert [entry['frames'] for entry in recording.index] == [4, 4, 2]
+    np.testing.assert_array_equal(recording.load('t'), np.arange(10))
+    np.testing.assert_array_equal(recording.load('aperture')[:, 1], -np.arange(10))
+
+    face = recording.load('face')
+    assert face.shape == (10, 4, 3)
+    assert np.isnan(face[::3]).all()
+    assert face[4, 0, 0] == 4
+
+    # Un rango que cruza segmentos
+    np.testing.assert_array_equal(recording.load('t', 3, 9), np.arange(3, 9))
+
+
+def test_resume_appends_segments(tmp_path):
+    path = str(tmp_path / 'rec')
+    record_frames(path, 0, 6)
+    record_frames(path, 6, 5)
+
+    # Segunda sesión: numeración y frames siguen donde quedó la primera
+    assert [entry['segment'] for entry in read_index(path)] == [0, 1, 2, 3]
+    recording = Recording(path)
+    assert len(recording) == 11
+    assert [entry['start'] for entry in recording.index] == [0, 4, 6, 10]
+    np.testing.assert_array_equal(recording.load('t'), np.arange(11))
+
+
+def test_resume_rejects_other_streams(tmp_path):
+    path = str(tmp_path / 'rec')
+    record_frames(path, 0, 2)
+    with pytest.raises(ValueError):
+        SeriesRecorder(path, {'face': (5, 3)})
+
+
+def test_writer_error_is_raised_on_close(tmp_path):
+    path = str(tmp_path / 'rec')
+    recorder = SeriesRecorder(path, STREAMS, chunk_frames=4, max_queue=2)
+    recorder.record(0.0, face=np.zeros((3, 3)))     # forma equivocada
+    for i in range(1, 10):
+        recorder.record(float(i))
+
+    # No se bloquea aunque el hilo de escritura ya no consuma la cola
+    with pytest.raises(ValueError):
+        recorder.close(timeout=1)
+    assert recorder.error is not None
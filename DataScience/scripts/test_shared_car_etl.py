@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from shared_car_etl import ETL
+
+SOURCE_COLUMNS = ['latitude', 'longitude', 'total_cars', 'cars_list', 'timestamp']
+
+
+def write_source(etl, rows):
+    pd.DataFrame(rows, columns=SOURCE_COLUMNS).to_sql('shared_car_locations', etl.engine,
+                                                      if_exists='append', index=False)
+
+
+@pytest.fixture
+def etl(tmp_path, monkeypatch):
+    # ETL crea databases/data.db relativo al directorio actual
+    monkeypatch.chdir(tmp_path)
+    return ETL(db_name='data.db', output_table_name='summary')
+
+
+def test_incremental_run_without_bookings_advances_watermark(etl):
+    # Ninguna fila califica (total_cars < 2)
+    write_source(etl, [
+        (32.08, 34.78, 0, '[]', '2024-01-01 10:00:00'),
+        (32.08, 34.78, 1, '[101]', '2024-01-01 11:00:00'),
+    ])
+    etl.run_incremental()
+    assert etl.read_watermark() == '2024-01-01 11:00:00'
+
+    # La corrida siguiente solo lee las filas nuevas y resume las que califican
+    write_source(etl, [(32.08, 34.78, 2, '[101, 102]', '2024-01-02 09:00:00')])
+    etl.run_incremental()
+    assert etl.read_watermark() == '2024-01-02 09:00:00'
+
+    with etl.engine.connect() as conn:
+        summary = pd.read_sql(text('SELECT * FROM summary'), conn)
+    assert len(summary) == 1
+    assert summary.loc[0, 'Num_Cars'] == 2
+    assert summary.loc[0, 'Avg_Bookings'] == 2.0
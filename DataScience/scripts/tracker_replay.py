@@ -0,0 +1,161 @@
+import csv
+import glob
+import os
+
+import cv2
+
+import landmarks as lmk
+from instrumentation import StageTimer
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def frame_source(source: str):
+    '''
+    Frames BGR de un video grabado o de una secuencia de imágenes: una carpeta
+    (ordenada por nombre) o un patrón glob como 'frames/*.png'.
+    '''
+    if os.path.isdir(source):
+        paths = sorted(os.path.join(source, f) for f in os.listdir(source)
+                       if f.lower().endswith(IMAGE_EXTENSIONS))
+    elif any(ch in source for ch in '*?['):
+        paths = sorted(glob.glob(source))
+    else:
+        paths = None
+
+    if paths is not None:
+        for path in paths:
+            frame = cv2.imread(path)
+            if frame is not None:
+                yield frame
+        return
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise RuntimeError(f'No se pudo abrir el video: {source}')
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+
+def make_step(tracker: str, timer, **options):
+    '''
+    Procesador sin Tk de cada app (el mismo que usa la app en vivo) y una
+    función frame → señales. Los módulos se importan solo al usarlos.
+    '''
+    if tracker == 'eyes':
+        from eyes_tracker import EyeProcessor
+        processor = EyeProcessor(timer=timer)
+        return processor, processor.step
+
+    if tracker == 'facemesh':
+        from facemesh import FaceMeshProcessor
+        processor = FaceMeshProcessor(timer=timer)
+
+        def step(frame):
+            _, pixels = processor.step(frame, **options)
+            if pixels is None:
+                return {'face': 0, 'x_min': None, 'y_min': None, 'x_max': None, 'y_max': None}
+            x_min, y_min, x_max, y_max = lmk.bbox(pixels)
+            return {'face': 1, 'x_min': x_min, 'y_min': y_min, 'x_max': x_max, 'y_max': y_max}
+
+        return processor, step
+
+    if tracker == 'hands_face':
+        from hands_and_face_tracker import HandsFaceProcessor
+        processor = HandsFaceProcessor(timer=timer, **options)
+
+        def step(frame):
+            _, hands_in_face = processor.step(frame)
+            return {'hands_in_face': hands_in_face}
+
+        return processor, step
+
+    if tracker == 'gesture':
+        from gesture_interaction import GestureProcessor
+        processor = GestureProcessor(timer=timer)
+        return processor, processor.step
+
+    raise ValueError(f"Tracker desconocido: {tracker} (eyes, facemesh, hands_face, gesture)")
+
+
+def replay(tracker: str, source: str, signals_path: str = None, max_frames: int = None, **options) -> dict:
+    '''
+    Corre el procesamiento por frame de `tracker` sobre `source` tan rápido
+    como se pueda, sin Tk. Devuelve FPS y p50/p95/p99 por etapa, y las
+    señales calculadas por frame (también en `signals_path`, como CSV).
+    '''
+    timer = StageTimer()
+    processor, step = make_step(tracker, timer, **options)
+    frames = frame_source(source)
+
+    signals = []
+    while max_frames is None or len(signals) < max_frames:
+        with timer.stage('lectura'):
+            frame = next(frames, None)
+        if frame is None:
+            timer.samples['lectura'].pop()  # Fin de la fuente, no es un frame
+            break
+
+        with timer.stage('frame'):
+            row = step(frame)
+        signals.append({'frame': len(signals), **row})
+
+    if hasattr(processor, 'close'):
+        processor.close()
+
+    if signals_path and signals:
+        with open(signals_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(signals[0]))
+            writer.writeheader()
+            writer.writerows(signals)
+
+    print(f'{tracker}: {len(signals)} frames de {source}\n')
+    timer.print_summary()
+    return {'stages': timer.summary(), 'signals': signals}
+
+
+def compare_signals(path_a: str, path_b: str, tolerance: float = 1e-3) -> dict:
+    '''
+    Compara las señales de dos corridas (p. ej. dos versiones del código sobre
+    el mismo video): frames distintos y diferencia máxima por columna.
+    '''
+    def read(path):
+        with open(path, newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+
+    rows_a, rows_b = read(path_a), read(path_b)
+    if len(rows_a) != len(rows_b):
+        print(f'⚠ Distinta cantidad de frames: {len(rows_a)} vs {len(rows_b)}')
+
+    report = {}
+    for column in rows_a[0] if rows_a else []:
+        if column == 'frame':
+            continue
+        mismatches, max_diff = 0, 0.0
+        for a, b in zip(rows_a, rows_b):
+            va, vb = a[column], b.get(column, '')
+            try:
+                diff = abs(float(va) - float(vb))
+                max_diff = max(max_diff, diff)
+                mismatches += diff > tolerance
+            except ValueError:
+                mismatches += va != vb
+        report[column] = {'mismatches': mismatches, 'max_diff': round(max_diff, 4)}
+        print(f'{column:<16} {mismatches:>6} frames distintos   dif. máx {max_diff:.4f}')
+
+    return report
+
+
+if __name__ == '__main__':
+    # Video de referencia grabado (o carpeta / patrón de imágenes)
+    source = 'grabacion.mp4'
+
+    for tracker in ['eyes', 'facemesh', 'hands_face', 'gesture']:
+        replay(tracker, source, signals_path=f'senales_{tracker}.csv')
+        print()
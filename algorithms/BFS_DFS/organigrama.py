@@ -0,0 +1,477 @@
+import csv
+import json
+import os
+import tempfile
+import time
+from array import array
+
+# Mismas constantes que organigrama.html / organigrama_didactico.html
+NODE_W = 236
+NODE_H = 72
+H_GAP = 50
+DEPTH_GAP = 86
+V_GAP = NODE_H + 28
+STACK_OFFSET_X = 36
+INDENT = 24
+
+# Encabezados aceptados por columna (igual que getField en el HTML)
+FIELDS = {
+    "id": ["Id. de empleado", "Id de empleado", "id"],
+    "parent": ["Id. de administrador", "Id de administrador", "parent"],
+    "name": ["Nombre", "name"],
+    "label": ["Título", "TÃ­tulo", "Titulo", "label"],
+    "role": ["Tipo de rol", "role"],
+}
+
+def detect_delimiter(header: str) -> str:
+    return ";" if header.count(";") > header.count(",") else ","
+
+def match_columns(header):
+    """Posición de cada campo conocido en el encabezado (None si no está)."""
+    normalized = [h.replace("\ufeff", "").strip().lower() for h in header]
+    columns = {}
+    for field, candidates in FIELDS.items():
+        columns[field] = next((normalized.index(c.lower()) for c in candidates
+                               if c.lower() in normalized), None)
+    if columns["id"] is None or columns["parent"] is None:
+        raise ValueError("El CSV debe tener columnas de empleado y de administrador.")
+    return columns
+
+class OrgChart:
+    """
+    Motor de jerarquía para organigramas grandes (100k+ empleados):
+    - Lee el CSV en streaming y guarda la estructura en arreglos compactos:
+      parent[i] (índice del jefe, -1 en la raíz) y listas de hijos en formato
+      CSR (child_ptr / child_idx), en el mismo orden del CSV.
+    - BFS, DFS, profundidad, tamaño de subárbol y span of control en tiempo
+      lineal; is_ancestor() en O(1) con el orden DFS y los tamaños.
+    - layout() reproduce layoutMixed del HTML (d3.tree hasta el corte y
+      bloques verticales con spine debajo) y to_json() lo deja listo para que
+      el HTML solo tenga que dibujarlo.
+    """
+
+    def __init__(self, ids, parent, names, labels, roles):
+        self.ids = ids
+        self.names = names
+        self.labels = labels
+        self.roles = roles
+        self.parent = parent
+        self.n = len(ids)
+        self.index = {emp_id: i for i, emp_id in enumerate(ids)}
+
+        roots = [i for i in range(self.n) if parent[i] == -1]
+        if not roots:
+            raise ValueError("No se encontro raiz (fila con parent vacio).")
+        if len(roots) > 1:
+            raise ValueError("Hay mas de una raiz (mas de un parent vacio).")
+        self.root = roots[0]
+
+        self.build_csr()
+        self._depth = self._size = self._tin = None
+
+    @classmethod
+    def from_csv(cls, path: str):
+        ids, parent_ids, names, labels, roles = [], [], [], [], []
+        index = {}
+
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            delimiter = detect_delimiter(f.readline())
+            f.seek(0)
+            reader = csv.reader(f, delimiter=delimiter)
+            columns = match_columns(next(reader))
+            get = {field: (lambda row, c=c: row[c].strip() if c is not None and c < len(row) else "")
+                   for field, c in columns.items()}
+
+            for row in reader:
+                emp_id = get["id"](row)
+                if not emp_id:
+                    continue
+                if emp_id in index:
+                    raise ValueError(f"ID duplicado: {emp_id}")
+                index[emp_id] = len(ids)
+                ids.append(emp_id)
+                parent_ids.append(get["parent"](row))
+                names.append(get["name"](row))
+                labels.append(get["label"](row))
+                roles.append(get["role"](row))
+
+        # Jefes como índices; un jefe inexistente deja al empleado fuera del árbol (como en el HTML)
+        parent = array("i", (index.get(p, -2) if p else -1 for p in parent_ids))
+        orphans = parent.count(-2)
+        if orphans:
+            print(f"⚠ {orphans} empleados con administrador inexistente quedan fuera del organigrama.")
+
+        return cls(ids, parent, names, labels, roles)
+
+    def build_csr(self):
+        """Hijos de cada nodo en child_idx[child_ptr[i]:child_ptr[i + 1]] (counting sort estable)."""
+        n = self.n
+        ptr = array("i", [0]) * (n + 1)
+        for p in self.parent:
+            if p >= 0:
+                ptr[p + 1] += 1
+        for i in range(n):
+            ptr[i + 1] += ptr[i]
+
+        fill = array("i", ptr)
+        idx = array("i", [0]) * ptr[n]
+        for child, p in enumerate(self.parent):
+            if p >= 0:
+                idx[fill[p]] = child
+                fill[p] += 1
+
+        self.child_ptr = ptr
+        self.child_idx = idx
+
+    def children(self, i: int):
+        return self.child_idx[self.child_ptr[i]:self.child_ptr[i + 1]]
+
+    # ---------------------
+    # RECORRIDOS Y CONSULTAS
+    # ---------------------
+
+    def bfs_order(self, start: int = None) -> array:
+        start = self.root if start is None else start
+        ptr, idx = self.child_ptr, self.child_idx
+        order = array("i", [start])
+        head = 0
+        while head < len(order):
+            v = order[head]
+            head += 1
+            order.extend(idx[ptr[v]:ptr[v + 1]])
+        return order
+
+    def dfs_order(self, start: int = None) -> array:
+        """Preorden: nodo -> hijos, en el orden del CSV."""
+        start = self.root if start is None else start
+        ptr, idx = self.child_ptr, self.child_idx
+        order = array("i")
+        stack = [start]
+        while stack:
+            v = stack.pop()
+            order.append(v)
+            stack.extend(reversed(idx[ptr[v]:ptr[v + 1]]))
+        return order
+
+    @property
+    def depth(self) -> array:
+        if self._depth is None:
+            depth = array("i", [-1]) * self.n
+            depth[self.root] = 0
+            for v in self.bfs_order():
+                if v != self.root:
+                    depth[v] = depth[self.parent[v]] + 1
+            self._depth = depth
+        return self._depth
+
+    @property
+    def subtree_size(self) -> array:
+        """Nodos en el subárbol de cada empleado (incluido él mismo)."""
+        if self._size is None:
+            size = array("i", [1]) * self.n
+            for v in reversed(self.bfs_order()):
+                if v != self.root:
+                    size[self.parent[v]] += size[v]
+            self._size = size
+        return self._size
+
+    def span_of_control(self, i: int) -> int:
+        """Reportes directos."""
+        return self.child_ptr[i + 1] - self.child_ptr[i]
+
+    def is_ancestor(self, a: int, b: int) -> bool:
+        """True si b está en el subárbol de a, en O(1)."""
+        if self._tin is None:
+            tin = array("i", [-1]) * self.n
+            for t, v in enumerate(self.dfs_order()):
+                tin[v] = t
+            self._tin = tin
+        tin = self._tin
+        return tin[b] >= 0 and tin[a] <= tin[b] < tin[a] + self.subtree_size[a]
+
+    def visit_order(self, cut_depth: int = 2) -> array:
+        """Orden de getVisitOrder: BFS hasta cut_depth y luego DFS bajo cada ancla."""
+        depth = self.depth
+        bfs = self.bfs_order()
+        order = array("i", (v for v in bfs if depth[v] <= cut_depth))
+        anchors = [v for v in order if depth[v] == cut_depth]
+        for a in anchors:
+            for c in self.children(a):
+                order.extend(self.dfs_order(c))
+        return order
+
+    # ---------------------
+    # LAYOUT
+    # ---------------------
+
+    def tidy_x(self, cut_depth: int):
+        """
+        x de d3.tree (Buchheim / Reingold-Tilford, separación 1 entre hermanos y
+        2 entre primos) para el árbol recortado en cut_depth, en unidades de nodo.
+        """
+        depth, parent, ptr, idx = self.depth, self.parent, self.child_ptr, self.child_idx
+        nodes = array("i", (v for v in self.bfs_order() if depth[v] <= cut_depth))
+        n = self.n
+
+        def kids(v):
+            return idx[ptr[v]:ptr[v + 1]] if depth[v] < cut_depth else ()
+
+        pos = {}  # Posición de cada nodo entre sus hermanos
+        for v in nodes:
+            for k, c in enumerate(kids(v)):
+                pos[c] = k
+        pos[self.root] = 0
+
+        z, m, c, s = {}, {}, {}, {}
+        t, a, anc = {}, {}, {}
+        for v in nodes:
+            z[v] = m[v] = c[v] = s[v] = 0.0
+            a[v] = v
+
+        def next_left(v):
+            k = kids(v)
+            return k[0] if k else t.get(v)
+
+        def next_right(v):
+            k = kids(v)
+            return k[-1] if k else t.get(v)
+
+        def separation(x, y):
+            return 1 if parent[x] == parent[y] else 2
+
+        def move_subtree(wm, wp, shift):
+            change = shift / (pos[wp] - pos[wm])
+            c[wp] -= change
+            s[wp] += shift
+            c[wm] += change
+            z[wp] += shift
+            m[wp] += shift
+
+        def execute_shifts(v):
+            shift = change = 0.0
+            for w in reversed(kids(v)):
+                z[w] += shift
+                m[w] += shift
+                change += c[w]
+                shift += s[w] + change
+
+        def apportion(v, w, ancestor):
+            if w is None:
+                return ancestor
+            siblings = kids(parent[v])
+            vip = vop = v
+            vim, vom = w, siblings[0]
+            sip, sop, sim, som = m[vip], m[vop], m[vim], m[vom]
+            while True:
+                vim, vip = next_right(vim), next_left(vip)
+                if vim is None or vip is None:
+                    break
+                vom, vop = next_left(vom), next_right(vop)
+                a[vop] = v
+                shift = z[vim] + sim - z[vip] - sip + separation(vim, vip)
+                if shift > 0:
+                    wm = a[vim] if parent[a[vim]] == parent[v] else ancestor
+                    move_subtree(wm, v, shift)
+                    sip += shift
+                    sop += shift
+                sim += m[vim]
+                sip += m[vip]
+                som += m[vom]
+                sop += m[vop]
+            if vim is not None and next_right(vop) is None:
+                t[vop] = vim
+                m[vop] += sim - sop
+            if vip is not None and next_left(vom) is None:
+                t[vom] = vip
+                m[vom] += sip - som
+                ancestor = v
+            return ancestor
+
+        # Primer recorrido en postorden (hijos en orden, antes que el padre)
+        stack, post = [self.root], []
+        while stack:
+            v = stack.pop()
+            post.append(v)
+            stack.extend(kids(v))
+        for v in reversed(post):
+            k = kids(v)
+            if v == self.root:
+                if k:
+                    execute_shifts(v)
+                    z[v] = (z[k[0]] + z[k[-1]]) / 2
+                continue
+            siblings = kids(parent[v])
+            w = siblings[pos[v] - 1] if pos[v] else None
+            if k:
+                execute_shifts(v)
+                midpoint = (z[k[0]] + z[k[-1]]) / 2
+                if w is not None:
+                    z[v] = z[w] + separation(v, w)
+                    m[v] = z[v] - midpoint
+                else:
+                    z[v] = midpoint
+            elif w is not None:
+                z[v] = z[w] + separation(v, w)
+            anc[parent[v]] = apportion(v, w, anc.get(parent[v], siblings[0]))
+
+        # Segundo recorrido de arriba hacia abajo: la raíz queda en x = 0
+        x = array("d", [0.0]) * n
+        m_root = -z[self.root]
+        x[self.root] = z[self.root] + m_root
+        m[self.root] += m_root
+        for v in nodes:
+            if v != self.root:
+                x[v] = z[v] + m[parent[v]]
+                m[v] += m[parent[v]]
+        return x, nodes
+
+    def layout(self, cut_depth: int = 3, stack: str = "level"):
+        """
+        Posiciones (x, y) de layoutMixed. stack="level" apila cada subárbol por
+        niveles (organigrama.html); stack="preorder" en preorden DFS con spines
+        entre hermanos (organigrama_didactico.html).
+        """
+        depth = self.depth
+        units, top = self.tidy_x(cut_depth)
+
+        x = array("d", [0.0]) * self.n
+        y = array("d", [0.0]) * self.n
+        vertical = bytearray(self.n)
+        spine_x = array("d", [0.0]) * self.n
+        spines = []
+
+        for v in top:
+            x[v] = units[v] * (NODE_W + H_GAP)
+            y[v] = depth[v] * (NODE_H + DEPTH_GAP)
+
+        for a in top:
+            if depth[a] != cut_depth or not self.span_of_control(a):
+                continue
+            cursor_y = y[a] + DEPTH_GAP
+
+            for child in self.children(a):
+                if stack == "preorder":
+                    block = self.dfs_order(child)
+                    for v in block:
+                        spine = x[a] + NODE_W / 2 + (depth[v] - depth[a] - 1) * INDENT
+                        vertical[v], spine_x[v] = 1, spine
+                        x[v], y[v] = spine + STACK_OFFSET_X, cursor_y
+                        cursor_y += V_GAP
+                    # Spines solo entre hermanos del mismo padre
+                    for p in block:
+                        if self.span_of_control(p) > 1:
+                            kids = self.children(p)
+                            spines.append({"x": spine_x[kids[0]],
+                                           "y0": y[kids[0]] + NODE_H / 2,
+                                           "y1": y[kids[-1]] + NODE_H / 2})
+                else:
+                    block = self.bfs_order(child)  # BFS ya viene agrupado por nivel
+                    start = 0
+                    while start < len(block):
+                        level = depth[block[start]]
+                        end = start
+                        while end < len(block) and depth[block[end]] == level:
+                            end += 1
+
+                        spine = x[a] + NODE_W / 2 + (level - depth[a] - 1) * INDENT
+                        start_mid = cursor_y + NODE_H / 2
+                        for v in block[start:end]:
+                            vertical[v], spine_x[v] = 1, spine
+                            x[v], y[v] = spine + STACK_OFFSET_X, cursor_y
+                            cursor_y += V_GAP
+                        if end - start > 1:
+                            spines.append({"x": spine, "y0": start_mid,
+                                           "y1": cursor_y - V_GAP + NODE_H / 2})
+                        cursor_y += 8
+                        start = end
+                cursor_y += 14
+
+        return {"x": x, "y": y, "vertical": vertical, "spine_x": spine_x, "spines": spines}
+
+    def to_json(self, path: str, cut_depth: int = 3, stack: str = "level"):
+        """
+        Layout precalculado en columnas (una lista por campo, en orden BFS) para
+        layoutFromJSON() de organigrama.html. parent es la posición del jefe en
+        estas mismas listas (-1 en la raíz).
+        """
+        lay = self.layout(cut_depth, stack)
+        order = self.bfs_order()
+        position = {v: k for k, v in enumerate(order)}
+        size = self.subtree_size
+
+        data = {
+            "cut_depth": cut_depth,
+            "stack": stack,
+            "id": [self.ids[v] for v in order],
+            "name": [self.names[v] for v in order],
+            "label": [self.labels[v] for v in order],
+            "role": [self.roles[v] for v in order],
+            "parent": [position.get(self.parent[v], -1) for v in order],
+            "depth": [self.depth[v] for v in order],
+            "size": [size[v] for v in order],
+            "span": [self.span_of_control(v) for v in order],
+            "x": [round(lay["x"][v], 2) for v in order],
+            "y": [round(lay["y"][v], 2) for v in order],
+            "vertical": [lay["vertical"][v] for v in order],
+            "spine_x": [round(lay["spine_x"][v], 2) for v in order],
+            "spines": lay["spines"],
+            "visit_order": [position[v] for v in self.visit_order(cut_depth)],
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        return data
+
+# ---------------------
+# BENCHMARK
+# ---------------------
+
+def synthetic_csv(path: str, n: int = 200_000, span: int = 8):
+    """Organigrama sintético: cada jefe con hasta `span` reportes directos."""
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(["Id. de empleado", "Id. de administrador", "Nombre", "Título"])
+        for i in range(1, n + 1):
+            manager = f"ID{(i - 2) // span + 1}" if i > 1 else ""
+            writer.writerow([f"ID{i}", manager, f"Empleado {i}", "Analista"])
+
+def benchmark(n: int = 200_000, span: int = 8):
+    folder = tempfile.mkdtemp()
+    csv_path = os.path.join(folder, "organigrama.csv")
+    synthetic_csv(csv_path, n, span)
+
+    start = time.perf_counter()
+    org = OrgChart.from_csv(csv_path)
+    timings = {"Lectura + CSR": time.perf_counter() - start}
+
+    for name, fn in [("BFS", org.bfs_order), ("DFS", org.dfs_order),
+                     ("Profundidad", lambda: org.depth),
+                     ("Tamaño de subárbol", lambda: org.subtree_size),
+                     ("Layout + JSON", lambda: org.to_json(os.path.join(folder, "layout.json")))]:
+        start = time.perf_counter()
+        fn()
+        timings[name] = time.perf_counter() - start
+
+    print(f"{n:,} empleados, span {span}\n")
+    for name, seconds in timings.items():
+        print(f"{name:<22} {seconds:>8.2f} s")
+    return timings
+
+def main():
+    # Organigrama de ejemplo junto a este script
+    folder = os.path.dirname(os.path.abspath(__file__))
+    org = OrgChart.from_csv(os.path.join(folder, "Organigrama.csv"))
+
+    print(f"Empleados: {org.n}  |  Raíz: {org.names[org.root]}")
+    print(f"Profundidad máxima: {max(org.depth)}")
+    print("BFS:", " ".join(org.ids[v] for v in org.bfs_order()))
+    print("DFS:", " ".join(org.ids[v] for v in org.dfs_order()))
+
+    print("\nMayor span of control:")
+    for v in sorted(range(org.n), key=org.span_of_control, reverse=True)[:5]:
+        print(f"{org.names[v]:<30} {org.span_of_control(v):>3} directos  {org.subtree_size[v] - 1:>3} en total")
+
+    org.to_json(os.path.join(folder, "organigrama_layout.json"))
+    print("\n✔ Layout guardado en organigrama_layout.json")
+
+if __name__ == "__main__":
+    main()
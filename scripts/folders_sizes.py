@@ -1,8 +1,240 @@
 import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-def get_folder_size(path: Path) -> int:
+class SizeScanner:
+    """
+    Motor de cálculo de tamaños:
+    - Recorre con os.scandir y reutiliza el stat de cada DirEntry (en Windows
+      viene gratis del listado del directorio; en Linux es un solo lstat).
+    - Reparte los subdirectorios entre los hilos de un pool: cada directorio
+      encontrado se encola como una tarea nueva.
+    - Cuenta una sola vez los archivos con varios hard links (hard_links).
+      Por defecto solo donde es gratis: en Windows el listado no trae
+      st_nlink y deduplicar cuesta un os.lstat extra por archivo, así que
+      ahí hay que pedirlo con hard_links=True.
+    - Opcionalmente no cruza a otros sistemas de archivos (one_filesystem).
+    """
+
+    def __init__(self, workers: int = 16, one_filesystem: bool = False, hard_links: bool = None):
+        self.workers = workers
+        self.one_filesystem = one_filesystem
+        self.hard_links = os.name != "nt" if hard_links is None else hard_links
+
+    def scan(self, roots: list) -> dict:
+        """Devuelve {raíz: tamaño total en bytes} para cada carpeta de `roots`."""
+        self.totals = defaultdict(int)
+        self.seen_inodes = set()
+        self.lock = threading.Lock()
+        self.pending = 1  # Guarda: evita terminar antes de encolar todas las raíces
+        self.done = threading.Event()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as self.pool:
+            for root in roots:
+                self.submit(str(root), root, os.stat(root).st_dev)
+            self.task_done()
+            self.done.wait()
+
+        return {root: self.totals[root] for root in roots}
+
+    def submit(self, path: str, root, dev: int):
+        with self.lock:
+            self.pending += 1
+        self.pool.submit(self.scan_dir, path, root, dev)
+
+    def first_link(self, st) -> bool:
+        """True la primera vez que se ve un inodo con varios hard links."""
+        key = (st.st_dev, st.st_ino)
+        with self.lock:
+            if key in self.seen_inodes:
+                return False
+            self.seen_inodes.add(key)
+            return True
+
+    def scan_dir(self, path: str, root, dev: int):
+        size = 0
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.one_filesystem:
+                                # En Windows DirEntry no trae st_dev
+                                entry_dev = entry.stat(follow_symlinks=False).st_dev or os.lstat(entry.path).st_dev
+                                if entry_dev != dev:
+                                    continue
+                            self.submit(entry.path, root, dev)
+                        else:
+                            st = entry.stat(follow_symlinks=False)
+                            if self.hard_links:
+                                if not st.st_nlink:
+                                    # En Windows el stat del listado trae st_nlink / st_ino / st_dev en 0
+                                    st = os.lstat(entry.path)
+                                if st.st_nlink > 1 and not self.first_link(st):
+                                    continue
+                            size += st.st_size
+                    except OSError:
+                        pass  # Archivos bloqueados o inaccesibles
+        except OSError:
+            pass  # Carpetas bloqueadas o inaccesibles
+        finally:
+            with self.lock:
+                self.totals[root] += size
+            self.task_done()
+
+    def task_done(self):
+        with self.lock:
+            self.pending -= 1
+            if self.pending == 0:
+                self.done.set()
+
+class SizeIndex:
+    """
+    Índice persistente (SQLite) de tamaños por carpeta:
+    - Guarda por carpeta: padre, mtime, tamaño de sus archivos directos y
+      tamaño total agregado con sus subcarpetas.
+    - Al re-escanear, una carpeta cuyo mtime no cambió reutiliza sus datos y su
+      lista de subcarpetas (solo cuesta un stat); solo se listan de nuevo las
+      carpetas con mtime distinto, y los totales se re-agregan hacia arriba.
+    - size() y top_children() responden directo desde el índice.
+
+    Nota: el mtime de una carpeta cambia al crear, borrar o renombrar entradas,
+    no cuando un archivo existente cambia de tamaño; para eso hay que usar
+    scan(full=True). Los hard links no se deduplican en el índice.
+    """
+
+    def __init__(self, db_path: str = "folders_sizes.db"):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                parent TEXT,
+                mtime_ns INTEGER,
+                files_size INTEGER,
+                total_size INTEGER
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ix_dirs_parent ON dirs (parent)")
+        self.conn.commit()
+
+    def subtree_rows(self, root: str):
+        """Filas del índice para `root` y todo lo que cuelga de él."""
+        prefix = root.rstrip(os.sep) + os.sep
+        upper = prefix[:-1] + chr(ord(os.sep) + 1)  # Rango de texto: todo lo que empieza con prefix
+        return self.conn.execute(
+            "SELECT path, parent, mtime_ns, files_size FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+            (root, prefix, upper)).fetchall()
+
+    def list_dir(self, path: str):
+        """Lista una carpeta: tamaño de sus archivos directos y sus subcarpetas."""
+        files_size, children = 0, []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            children.append(entry.path)
+                        else:
+                            files_size += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        pass  # Archivos bloqueados o inaccesibles
+        except OSError:
+            pass  # Carpetas bloqueadas o inaccesibles
+        return files_size, children
+
+    def scan(self, root, full: bool = False) -> dict:
+        """Escanea (o re-escanea de forma incremental) `root` y actualiza el índice."""
+        start = time.perf_counter()
+        root = os.path.abspath(root)
+
+        # Lo indexado bajo root: con full=True solo sirve para detectar borrados
+        existing = self.subtree_rows(root)
+        known, known_children = {}, defaultdict(list)
+        if not full:
+            for path, parent, mtime_ns, files_size in existing:
+                known[path] = (mtime_ns, files_size)
+                known_children[parent].append(path)
+
+        rows, totals = {}, {}
+        visited = listed = 0
+        stack = [(root, os.path.dirname(root), False)]
+        while stack:
+            path, parent, expanded = stack.pop()
+
+            if expanded:
+                # Post-orden: ya se conocen los totales de las subcarpetas
+                mtime_ns, files_size, children = rows[path]
+                totals[path] = files_size + sum(totals.get(c, 0) for c in children)
+                continue
+
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                continue  # Carpeta borrada o inaccesible
+            visited += 1
+
+            if path in known and known[path][0] == mtime_ns:
+                files_size, children = known[path][1], known_children[path]
+            else:
+                files_size, children = self.list_dir(path)
+                listed += 1
+
+            rows[path] = (mtime_ns, files_size, children)
+            stack.append((path, parent, True))
+            stack.extend((c, path, False) for c in children)
+
+        parents = {c: p for p, (_, _, children) in rows.items() for c in children}
+        with self.conn:
+            # Carpetas que ya no existen
+            removed = [(p,) for p, *_ in existing if p not in rows]
+            self.conn.executemany("DELETE FROM dirs WHERE path = ?", removed)
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO dirs (path, parent, mtime_ns, files_size, total_size) VALUES (?, ?, ?, ?, ?)",
+                [(p, parents.get(p, os.path.dirname(p)), m, f, totals[p]) for p, (m, f, _) in rows.items()])
+            self.update_ancestors(root)
+
+        return {"dirs": visited, "listed": listed, "removed": len(removed),
+                "seconds": round(time.perf_counter() - start, 3)}
+
+    def update_ancestors(self, path: str):
+        """Re-agrega el total de las carpetas indexadas por encima de `path` (tras escanear un subárbol)."""
+        parent = os.path.dirname(path)
+        while parent != path:
+            row = self.conn.execute("SELECT files_size FROM dirs WHERE path = ?", (parent,)).fetchone()
+            if row is None:
+                break
+            children = self.conn.execute("SELECT COALESCE(SUM(total_size), 0) FROM dirs WHERE parent = ?",
+                                         (parent,)).fetchone()[0]
+            self.conn.execute("UPDATE dirs SET total_size = ? WHERE path = ?", (row[0] + children, parent))
+            path, parent = parent, os.path.dirname(parent)
+
+    def size(self, path):
+        """Tamaño total de una carpeta según el índice (None si no está indexada)."""
+        row = self.conn.execute("SELECT total_size FROM dirs WHERE path = ?",
+                                (os.path.abspath(path),)).fetchone()
+        return row[0] if row else None
+
+    def top_children(self, path, n: int = 10):
+        """Las n subcarpetas más pesadas de una carpeta, según el índice."""
+        return self.conn.execute(
+            "SELECT path, total_size FROM dirs WHERE parent = ? ORDER BY total_size DESC LIMIT ?",
+            (os.path.abspath(path), n)).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+def get_folder_size(path: Path, workers: int = 16, one_filesystem: bool = False, hard_links: bool = None) -> int:
     """Calcula el tamaño total de una carpeta."""
+    return SizeScanner(workers, one_filesystem, hard_links).scan([path])[path]
+
+def get_folder_size_walk(path: Path) -> int:
+    """Versión original con os.walk + os.path.getsize (referencia del benchmark)."""
     total_size = 0
     for dirpath, _, filenames in os.walk(path):
         for f in filenames:
@@ -17,7 +249,68 @@ def to_MB(size_in_bytes: int) -> str:
     """Convierte bytes a MB con 2 decimales."""
     return f"{round(size_in_bytes / (1024 * 1024), 2)} MB"
 
-def main():
+def make_tree(root: Path, depth: int, fanout: int, files_per_dir: int):
+    """Genera un árbol de carpetas profundo para el benchmark."""
+    root.mkdir(parents=True, exist_ok=True)
+    for i in range(files_per_dir):
+        (root / f"file_{i}.bin").write_bytes(b"x" * (i * 37 % 4096))
+    if depth > 0:
+        for d in range(fanout):
+            make_tree(root / f"dir_{d}", depth - 1, fanout, files_per_dir)
+
+def benchmark(depth: int = 5, fanout: int = 5, files_per_dir: int = 20, workers=(1, 4, 16)):
+    """Compara os.walk con SizeScanner sobre un árbol generado."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        print("Generando árbol de prueba...")
+        make_tree(tmp / "tree", depth, fanout, files_per_dir)
+        n_dirs = sum(fanout ** d for d in range(depth + 1))
+        print(f"{n_dirs:,} carpetas, {n_dirs * files_per_dir:,} archivos\n")
+
+        start = time.perf_counter()
+        expected = get_folder_size_walk(tmp / "tree")
+        base = time.perf_counter() - start
+        print(f"{'os.walk + getsize':<24} {base:>8.3f} s")
+
+        for n in workers:
+            start = time.perf_counter()
+            size = get_folder_size(tmp / "tree", workers=n)
+            elapsed = time.perf_counter() - start
+            assert size == expected, (size, expected)
+            print(f"{f'SizeScanner ({n} hilos)':<24} {elapsed:>8.3f} s  {base / elapsed:>5.2f}x")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def benchmark_index(depth: int = 5, fanout: int = 6, files_per_dir: int = 50):
+    """Primer escaneo vs. re-escaneo sin cambios vs. re-escaneo con un cambio."""
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        print("Generando árbol de prueba...")
+        make_tree(tmp / "tree", depth, fanout, files_per_dir)
+        index = SizeIndex(str(tmp / "index.db"))
+
+        first = index.scan(tmp / "tree")
+        print(f"{'Primer escaneo':<28} {first}")
+        second = index.scan(tmp / "tree")
+        print(f"{'Re-escaneo sin cambios':<28} {second}")
+
+        (tmp / "tree" / "dir_0" / "dir_0" / "nuevo.bin").write_bytes(b"x" * 1000)
+        third = index.scan(tmp / "tree")
+        print(f"{'Re-escaneo con un cambio':<28} {third}")
+
+        assert index.size(tmp / "tree") == get_folder_size_walk(tmp / "tree")
+        print(f"\nTop 3 en {tmp / 'tree'}: {index.top_children(tmp / 'tree', 3)}")
+        index.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def main(index_path: str = "folders_sizes.db", full: bool = False):
+    """
+    Tamaños de los archivos y subcarpetas de la ruta. Las subcarpetas salen del
+    índice persistente (SizeIndex en index_path): cada corrida solo re-lista las
+    carpetas que cambiaron. full=True (python folders_sizes.py --full) fuerza
+    el re-escaneo completo, p. ej. si crecieron archivos existentes.
+    """
     # Ruta a analizar
     input_path = Path(r"C:\Users\USER\Documents")
 
@@ -32,16 +325,26 @@ def main():
         print(f"Tamaños de archivos y subcarpetas en: {input_path}\n")
         folder_sizes = []
         for item in input_path.iterdir():
-            if item.is_dir():
-                size = get_folder_size(item)
-            elif item.is_file():
-                size = item.stat().st_size
-            folder_sizes.append((item.name, size))
+            if item.is_file() and not item.is_symlink():
+                folder_sizes.append((item.name, item.stat().st_size))
+
+        index = SizeIndex(index_path)
+        try:
+            stats = index.scan(input_path, full=full)
+            for path, size in index.top_children(input_path, n=-1):  # -1: sin límite en SQLite
+                folder_sizes.append((os.path.basename(path), size))
+        finally:
+            index.close()
+
         folder_sizes.sort(key=lambda x: x[1], reverse=True)
         for name, size in folder_sizes:
             print(f"{name:<30} {to_MB(size):>10}")
+
+        mode = "completo" if full else "incremental"
+        print(f"\nÍndice {index_path} ({mode}): {stats['listed']:,} de {stats['dirs']:,} carpetas "
+              f"listadas en {stats['seconds']} s")
     else:
         print("La ruta no es un archivo ni una carpeta válida.")
 
 if __name__ == "__main__":
-    main()
+    main(full="--full" in sys.argv[1:])